@@ -5,20 +5,27 @@ This module contains the configuration and initialization of CrewAI agents
 for multimodal document retrieval and web search capabilities.
 """
 from crewai import Agent
-from agents.tools import search_web,retrive_from_document
+from agents.tools import search_web,document_tool
 import os
 import google.generativeai as genai
 
 # Configure Google Generative AI with API key from environment variables
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+def build_agent(**search_kwargs):
+    """
+    Build the multimodal retrieval agent. search_kwargs (owner_id, document_ids,
+    top_k, score_threshold) are applied to every document retrieval it makes.
+    """
+    return Agent(
+        role="Multimodal Retrieval Agent",
+        goal="Answer queries using local data or fallback to web",
+        backstory="You are a research assistant trained in visual document understanding. "
+                  "Your job is to retrieve relevant pages from internal documents (including the document name and the page number for the document) and fall back to the internet if needed.",
+        tools=[search_web,document_tool(**search_kwargs)],# Tools available for the agent to use
+        verbose=True,# Enable verbose logging for debugging and monitoring #remove this
+        llm='gemini/gemini-2.5-flash' # Use Gemini 2.5 Flash as the underlying language model
+    )
+
 # Initialize the multimodal retrieval agent
-agent = Agent(
-    role="Multimodal Retrieval Agent",
-    goal="Answer queries using local data or fallback to web",
-    backstory="You are a research assistant trained in visual document understanding. "
-              "Your job is to retrieve relevant pages from internal documents (including the document name and the page number for the document) and fall back to the internet if needed.",
-    tools=[search_web,retrive_from_document],# Tools available for the agent to use
-    verbose=True,# Enable verbose logging for debugging and monitoring #remove this
-    llm='gemini/gemini-2.5-flash' # Use Gemini 2.5 Flash as the underlying language model
-)
\ No newline at end of file
+agent = build_agent()
\ No newline at end of file
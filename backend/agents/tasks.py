@@ -9,7 +9,7 @@ from crewai import Task
 from core.rag_singleton import rag
 from agents.agents import agent
 
-def build_task(query: str):
+def build_task(query: str, task_agent=None, **search_kwargs):
     """
     Build a CrewAI task for document retrieval and web search fallback.
     
@@ -19,6 +19,8 @@ def build_task(query: str):
     
     Args:
         query (str): The user query to search for
+        task_agent (Agent): Agent to assign, defaults to the shared unscoped agent
+        **search_kwargs: Retrieval options (owner_id, document_ids, top_k, score_threshold)
         dataset (list): List of documents/data sources (currently unused but 
                        kept for future extensibility)
     
@@ -43,7 +45,7 @@ def build_task(query: str):
         Returns:
             str: Either the RAG results or a fallback indicator
         """
-        results = rag.generate_result(query) # Attempt to retrieve information from local documents using RAG
+        results = rag.generate_result(query, **search_kwargs) # Attempt to retrieve information from local documents using RAG
         # Check if RAG found relevant information
         if results['status'] == 'no_results' or "No relevant information found" in str(results):
             # Trigger fallback to web search by returning special format
@@ -53,6 +55,6 @@ def build_task(query: str):
     return Task(
         description=f"Retrieve info about: {query}",
         expected_output="A response answering the query.",
-        agent=agent,# Assign the multimodal retrieval agent
+        agent=task_agent or agent,# Assign the multimodal retrieval agent
         steps=[task_logic]# Define the execution steps
     )
\ No newline at end of file
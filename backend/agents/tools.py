@@ -30,28 +30,43 @@ def search_web(query: str) -> str:
     except Exception as e:
         return f"Search failed: {e}"
 
-@tool("Document Retrival Tool")
-def retrive_from_document(query:str)->str:
+def document_tool(**search_kwargs):
     """
-    Retrieve relevant content from local document database.
-    
-    Uses the RAG singleton to search through indexed documents
-    and return matching content based on semantic similarity.
+    Build the document retrieval tool, scoped to one owner's documents when owner_id is given.
     
     Args:
-        query (str): User query for document search
+        **search_kwargs: Options passed to rag.generate_result: owner_id, document_ids,
+            top_k and score_threshold
         
     Returns:
-        str: Retrieved document content or status message
+        Tool: CrewAI tool searching the local document database
     """
-    try:
-        result=rag.generate_result(query)
-        if result['status']=="success":
-            return result
-        elif result['status']=="no_results":
-            return result['message']
-        else:
-            return f"Error: {result['message']}"
-    except Exception as e:
-        return f"Retrival failed: {e}"
-    
+    @tool("Document Retrival Tool")
+    def retrive_from_document(query:str)->str:
+        """
+        Retrieve relevant content from local document database.
+        
+        Uses the RAG singleton to search through indexed documents
+        and return matching content based on semantic similarity.
+        
+        Args:
+            query (str): User query for document search
+            
+        Returns:
+            str: Retrieved document content or status message
+        """
+        try:
+            result=rag.generate_result(query,**search_kwargs)
+            if result['status']=="success":
+                return result
+            elif result['status']=="no_results":
+                return result['message']
+            else:
+                return f"Error: {result['message']}"
+        except Exception as e:
+            return f"Retrival failed: {e}"
+
+    return retrive_from_document
+
+# Unscoped tool searching every indexed document
+retrive_from_document=document_tool()
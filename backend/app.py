@@ -1,12 +1,15 @@
 from flask import Flask
 from flask_jwt_extended import JWTManager
 from config.database import init_database
-from config.settings import Config
+from config.settings import Config, RAG_WARMUP, EMBED_WORKERS
 from routes.auth import auth_bp
 from routes.documents import documents_bp
 from routes.chat import chat_bp
 from routes.users import users_bp
 from routes.agent import agent_bp
+from routes.health import health_bp
+from core.rag_singleton import rag
+from services.query_service import converter
 from middleware.error_handlers import register_error_handlers
 import os
 from flask_cors import CORS
@@ -56,6 +59,7 @@ def create_app():
     app.register_blueprint(chat_bp)
     app.register_blueprint(users_bp)
     app.register_blueprint(agent_bp)
+    app.register_blueprint(health_bp)
     
     # Root route
     @app.route("/")
@@ -67,14 +71,32 @@ def create_app():
                 "login": "/login",
                 "documents": "/documents",
                 "chat_sessions": "/chat_sessions",
-                "query": "/query/"
+                "query": "/query/",
+                "health": "/healthz",
+                "ready": "/readyz"
             }
         }
     
     return app
 
+def start_warmup():
+    """
+    Fork the PDF rasterization workers, then load and warm the RAG models in the
+    background so the server answers immediately. The workers are forked first,
+    while no other thread runs and before the model is in memory.
+    Called by the server entry points only, so scripts importing the app
+    (reset_db.py, gc_index.py) do not start worker pools or load ColPali.
+    """
+    converter.start()
+    # Embedding workers fork when the pipeline is built, so with them it is built here before the server starts threads
+    if RAG_WARMUP:
+        rag.start_warmup(build_now=EMBED_WORKERS > 1)
+    elif EMBED_WORKERS > 1:
+        rag.get_rag()
+
 # Create the application instance
 app = create_app()
 
 if __name__ == '__main__':
+    start_warmup()
     app.run(debug=True, port=8000, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Compare ColpaliClient inference profiles.
+
+For each profile, reports pages/sec, queries/sec and embedding drift against
+the bf16 reference output (mean cosine distance per vector and the largest
+MaxSim score difference over all query/page pairs).
+
+Usage:
+    python -m benchmarks.colpali_profiles --pdf uploads/manual.pdf --pages 8 --threads 8
+"""
+import argparse
+import gc
+import numpy as np
+from core.colpali_client import ColpaliClient, PROFILE_DTYPES
+from benchmarks.common import DEFAULT_QUERIES, Timer, load_pages, print_table
+
+
+def maxsim_scores(query_embeddings, page_embeddings) -> np.ndarray:
+    """
+    MaxSim score matrix of shape (queries, pages).
+    """
+    scores = np.zeros((len(query_embeddings), len(page_embeddings)), dtype=np.float32)
+    for i, q in enumerate(query_embeddings):
+        for j, p in enumerate(page_embeddings):
+            scores[i, j] = (q @ p.T).max(axis=1).sum()
+    return scores
+
+
+def cosine_distance(a: np.ndarray, b: np.ndarray) -> float:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True).clip(min=1e-12)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True).clip(min=1e-12)
+    return float(1.0 - (a * b).sum(axis=1).mean())
+
+
+def run_profile(profile, images, queries, threads, batch_size):
+    client = ColpaliClient(profile=profile, num_threads=threads)
+
+    # Warm up once so torch.compile and lazy initialisation are not timed
+    client.get_image_embeddings(images[:1])
+    client.get_query_embeddings_batch(queries[:1])
+
+    page_embeddings = []
+    with Timer() as page_timer:
+        for i in range(0, len(images), batch_size):
+            page_embeddings.extend(client.get_image_embeddings(images[i:i + batch_size]))
+    with Timer() as query_timer:
+        query_embeddings = [client.get_query_embeddings(q) for q in queries]
+
+    del client
+    gc.collect()
+    return (
+        [np.asarray(p, dtype=np.float32) for p in page_embeddings],
+        [np.asarray(q, dtype=np.float32) for q in query_embeddings],
+        len(images) / page_timer.elapsed,
+        len(queries) / query_timer.elapsed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", required=True, help="PDF used as the page workload")
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=None, help="intra-op thread count")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILE_DTYPES), choices=list(PROFILE_DTYPES))
+    args = parser.parse_args()
+
+    images = load_pages(args.pdf, args.pages)
+    queries = DEFAULT_QUERIES
+    print(f"[INFO] Benchmarking {len(images)} pages and {len(queries)} queries")
+
+    ref_pages, ref_queries, ref_pps, ref_qps = run_profile("bf16", images, queries, args.threads, args.batch_size)
+    ref_scores = maxsim_scores(ref_queries, ref_pages)
+
+    rows = []
+    for profile in args.profiles:
+        if profile == "bf16":
+            pages, queries_out, pps, qps = ref_pages, ref_queries, ref_pps, ref_qps
+        else:
+            pages, queries_out, pps, qps = run_profile(profile, images, queries, args.threads, args.batch_size)
+        scores = maxsim_scores(queries_out, pages)
+        rows.append({
+            "profile": profile,
+            "pages/sec": pps,
+            "queries/sec": qps,
+            "page_cos_drift": float(np.mean([cosine_distance(a, b) for a, b in zip(pages, ref_pages)])),
+            "query_cos_drift": float(np.mean([cosine_distance(a, b) for a, b in zip(queries_out, ref_queries)])),
+            "max_score_diff": float(np.abs(scores - ref_scores).max()),
+            "top1_agree": float((scores.argmax(axis=1) == ref_scores.argmax(axis=1)).mean()),
+        })
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
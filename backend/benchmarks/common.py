@@ -0,0 +1,73 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks are run from the backend directory, e.g.
+    python -m benchmarks.colpali_profiles --pdf uploads/manual.pdf
+"""
+import resource
+import sys
+import time
+from typing import List
+from pdf2image import convert_from_path
+
+DEFAULT_QUERIES = [
+    "What is the maximum spindle speed?",
+    "How do I calibrate the tool length offset?",
+    "Which safety checks are required before startup?",
+    "What does alarm code 1010 mean?",
+    "How often should the coolant be replaced?",
+    "What is the recommended feed rate for aluminium?",
+    "Where is the emergency stop located?",
+    "How do I home all axes?",
+]
+
+
+def load_pages(pdf_path: str, max_pages: int = None) -> List:
+    """
+    Rasterize up to max_pages pages of a PDF into RGB PIL images.
+    """
+    images = convert_from_path(pdf_path, first_page=1, last_page=max_pages)
+    return [image.convert("RGB") for image in images]
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of the current process in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Timer:
+    """
+    Context manager measuring wall-clock time in seconds.
+    """
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+
+def print_table(rows: List[dict]) -> None:
+    """
+    Print a list of result dicts as an aligned text table.
+    """
+    if not rows:
+        print("No results")
+        return
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for row in rows:
+        print("  ".join(_fmt(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.4f}" if abs(value) < 1 else f"{value:.2f}"
+    return str(value)
@@ -0,0 +1,115 @@
+"""
+Memory and throughput of the indexing path: nested Python lists vs NumPy arrays.
+
+The "lists" mode reproduces the original path, where every page embedding was
+converted with .tolist() and kept inside a PointStruct until upsert. The
+"arrays" mode runs the current VectorDBClient.create_points/insert_data path,
+which carries contiguous arrays and converts per upsert batch.
+
+Without --pdf, page embeddings are synthetic (1030x128, the ColPali page shape)
+so the benchmark isolates representation costs from model time.
+
+Usage:
+    python -m benchmarks.indexing_memory --pages 200
+    python -m benchmarks.indexing_memory --pdf uploads/manual.pdf --pages 200 --qdrant-url http://localhost:6333
+"""
+import argparse
+import gc
+import tracemalloc
+import numpy as np
+from qdrant_client.http import models
+from core.qdrant_client import VectorDBClient
+from benchmarks.common import Timer, load_pages, print_table
+
+PAGE_TOKENS = 1030
+EMBEDDING_DIM = 128
+
+
+class SyntheticEncoder:
+    """
+    Stand-in for ColpaliClient returning random page embeddings of the real shape.
+    """
+    def __init__(self, dtype: str = "float32", seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.dtype = np.dtype(dtype)
+
+    def get_image_embeddings(self, images):
+        return [
+            self.rng.standard_normal((PAGE_TOKENS, EMBEDDING_DIM), dtype=np.float32).astype(self.dtype)
+            for _ in images
+        ]
+
+
+def index_with_lists(qdrant: VectorDBClient, encoder, dataset, collection, batch_size):
+    """
+    The original path: nested Python lists held in PointStructs for the whole dataset.
+    """
+    points = []
+    for i in range(0, len(dataset), batch_size):
+        batch = dataset[i:i + batch_size]
+        embeddings = encoder.get_image_embeddings([item["image"] for item in batch])
+        for j, embedding in enumerate(embeddings):
+            points.append(models.PointStruct(
+                id=i + j,
+                vector=np.asarray(embedding, dtype=np.float32).tolist(),
+                payload={"doc_id": batch[j]["doc_id"], "page_num": batch[j]["page_number"], "source": batch[j]["filename"]},
+            ))
+    for i in range(0, len(points), batch_size):
+        qdrant.client.upsert(collection_name=collection, points=points[i:i + batch_size], wait=True)
+
+
+def index_with_arrays(qdrant: VectorDBClient, encoder, dataset, collection, batch_size):
+    points = qdrant.create_points(encoder, dataset, batch_size=batch_size)
+    qdrant.insert_data(points, dataset, batch_size=batch_size, collection_name=collection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="index real pages with ColPali instead of synthetic embeddings")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--qdrant-url", default=":memory:")
+    parser.add_argument("--qdrant-api-key", default=None)
+    args = parser.parse_args()
+
+    if args.pdf:
+        from core.colpali_client import ColpaliClient
+        encoder = ColpaliClient(embedding_dtype=args.dtype)
+        images = load_pages(args.pdf, args.pages)
+    else:
+        encoder = SyntheticEncoder(args.dtype)
+        images = [None] * args.pages
+    dataset = [
+        {"image": image, "doc_id": 1, "page_number": n + 1, "filename": "benchmark.pdf"}
+        for n, image in enumerate(images)
+    ]
+
+    qdrant = VectorDBClient(args.qdrant_url, args.qdrant_api_key)
+    rows = []
+    for mode, index in (("lists", index_with_lists), ("arrays", index_with_arrays)):
+        collection = f"bench_indexing_{mode}"
+        if qdrant.client.collection_exists(collection):
+            qdrant.client.delete_collection(collection)
+        qdrant.create_collection(name=collection, two_stage=False)
+
+        gc.collect()
+        tracemalloc.start()
+        with Timer() as timer:
+            index(qdrant, encoder, dataset, collection, args.batch_size)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rows.append({
+            "mode": mode,
+            "pages": len(dataset),
+            "seconds": timer.elapsed,
+            "pages/sec": len(dataset) / timer.elapsed,
+            "peak_MB": peak / (1024 * 1024),
+        })
+        qdrant.client.delete_collection(collection)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Embedded NumPy engine vs Qdrant, by corpus size.
+
+Indexes the same synthetic corpus of clustered page multivectors into the
+local engine (VECTOR_BACKEND=local) and into Qdrant, then reports indexing
+time, search latency with and without the pooled prefetch, size on disk and
+how often both engines return the same top 5.
+
+Qdrant defaults to local ':memory:' mode; pass --qdrant-url to compare against
+a server instead.
+
+Usage:
+    python -m benchmarks.local_index --sizes 1000 10000 --tokens 64
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import numpy as np
+from core.qdrant_client import VectorDBClient
+from core.local_index import LocalVectorDBClient
+from benchmarks.common import Timer, print_table
+from benchmarks.two_stage_retrieval import make_corpus, make_queries
+
+
+def directory_mb(path):
+    total = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+    return total / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 5000, 20000])
+    parser.add_argument("--tokens", type=int, default=64, help="vectors per synthetic page")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--prefetch", type=int, default=100)
+    parser.add_argument("--qdrant-url", default=":memory:")
+    parser.add_argument("--qdrant-api-key", default=None)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="local_index_bench_")
+    engines = {
+        "qdrant": VectorDBClient(args.qdrant_url, args.qdrant_api_key),
+        "local": LocalVectorDBClient(root),
+    }
+    rows = []
+    try:
+        for size in args.sizes:
+            collection = f"bench_local_{size}"
+            queries = make_queries(np.random.default_rng(size), args.queries, 16, args.topics)
+            results = {}
+            for name, engine in engines.items():
+                if name == "qdrant" and engine.client.collection_exists(collection):
+                    engine.client.delete_collection(collection)
+                engine.create_collection(name=collection)
+                rng = np.random.default_rng(size)
+                next_id = 0
+                with Timer() as index_timer:
+                    for labels, vectors in make_corpus(rng, size, args.tokens, args.topics):
+                        points = [
+                            {"id": next_id + i, "vector": page, "payload": {"doc_id": int(label)}}
+                            for i, (label, page) in enumerate(zip(labels, vectors))
+                        ]
+                        for start in range(0, len(points), 64):
+                            engine.upsert_batch(points[start:start + 64], collection)
+                        next_id += len(points)
+
+                for prefetch_limit in (None, args.prefetch):
+                    latencies, ids = [], []
+                    for query in queries:
+                        with Timer() as timer:
+                            response = engine.search(query, collection_name=collection, prefetch_limit=prefetch_limit)
+                        latencies.append(timer.elapsed * 1000)
+                        ids.append([point.id for point in response.points])
+                    results[(name, prefetch_limit)] = ids
+                    rows.append({
+                        "pages": size,
+                        "engine": name,
+                        "prefetch": prefetch_limit or "full",
+                        "index_s": index_timer.elapsed,
+                        "latency_ms_p50": float(np.median(latencies)),
+                        "latency_ms_p95": float(np.percentile(latencies, 95)),
+                        "disk_mb": directory_mb(os.path.join(root, collection)) if name == "local" else "-",
+                    })
+
+            # Exact MaxSim on both sides, so rankings should agree up to float16 rounding
+            exact = results[("qdrant", None)]
+            for row in rows[-4:]:
+                mine = results[(row["engine"], None if row["prefetch"] == "full" else row["prefetch"])]
+                row["overlap@5"] = float(np.mean([len(set(a) & set(b)) / max(1, len(b)) for a, b in zip(mine, exact)]))
+            engines["qdrant"].client.delete_collection(collection)
+            engines["local"].delete_collection(collection)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Peak RSS and conversion time per page for PdfConverter resolution settings.
+
+Each setting runs in a fresh process so its peak RSS is not hidden by an
+earlier run. Settings are given as DPI:EMBED_SIZE[:WINDOW] triples, where an
+embed size of 0 keeps the full-resolution bitmap for embedding and a window
+of 0 rasterizes the whole file in one poppler call (the original behaviour).
+Pages are consumed as a stream, the way the indexing path consumes them,
+including waiting for each page image to be written. --codecs compares page
+image codecs as FORMAT[:QUALITY] (for png the number is the compress level).
+
+Usage:
+    python -m benchmarks.page_preprocessing --pdf uploads/manual.pdf --settings 200:0:0 200:448:0 200:448:8 200:448:1
+    python -m benchmarks.page_preprocessing --pdf uploads/manual.pdf --settings 200:448:8 --codecs png png:1 jpeg:85 webp:80
+"""
+import argparse
+import multiprocessing
+import tempfile
+from benchmarks.common import Timer, peak_rss_mb, print_table
+
+
+def _convert(pdf, dpi, embed_size, window, codec, poppler_path, results):
+    from core.utils import PdfConverter
+
+    image_format, _, level = codec.partition(":")
+    options = {"png_compress_level": int(level)} if level and image_format == "png" else {}
+    if level and image_format != "png":
+        options["image_quality"] = int(level)
+    with tempfile.TemporaryDirectory() as image_dir:
+        converter = PdfConverter(image_dir=image_dir, dpi=dpi, embed_size=embed_size, poppler_path=poppler_path,
+                                 page_window=window, image_format=image_format, **options)
+        pages, width, height, encode_ms, image_bytes = 0, 0, 0, 0.0, 0
+        with Timer() as timer:
+            for page in converter.iter_convert(pdf):
+                saved = page["saved"].result()
+                pages += 1
+                width, height = page["image"].size
+                encode_ms += saved["encode_ms"]
+                image_bytes += saved["bytes"]
+        converter.close()
+        results.put({
+            "dpi": dpi,
+            "embed_size": embed_size or "full",
+            "window": window or "all",
+            "codec": codec,
+            "pages": pages,
+            "embed_px": f"{width}x{height}",
+            "ms/page": timer.elapsed * 1000 / max(1, pages),
+            "encode_ms/page": encode_ms / max(1, pages),
+            "KB/page": image_bytes / 1024 / max(1, pages),
+            "peak_rss_MB": peak_rss_mb(),
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--settings", nargs="+", default=["200:0:0", "200:448:0", "200:448:8", "200:448:1"])
+    parser.add_argument("--codecs", nargs="+", default=["png"])
+    parser.add_argument("--poppler-path", default=None)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    rows = []
+    for setting in args.settings:
+        values = [int(v) for v in setting.split(":")]
+        dpi, embed_size, window = values[0], values[1], values[2] if len(values) > 2 else 0
+        for codec in args.codecs:
+            proc = ctx.Process(target=_convert, args=(args.pdf, dpi, embed_size, window, codec, args.poppler_path, results))
+            proc.start()
+            rows.append(results.get())
+            proc.join()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
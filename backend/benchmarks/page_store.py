@@ -0,0 +1,92 @@
+"""
+Page image lookups: loose files vs the packed page store.
+
+Writes the same synthetic page blobs once as loose doc_<id>_page_<n>_<name>.png
+files, looked up the way results used to be (probing reconstructed names per
+codec extension, then open and read), and once into the PageStore, looked up by
+document id and page number from memory-mapped files. Reports write time,
+lookup latency for random result pages, file count and size on disk.
+
+Usage:
+    python -m benchmarks.page_store --documents 200 --pages 40 --lookups 5000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import numpy as np
+from core.page_store import PageStore
+from benchmarks.common import Timer, print_table
+
+EXTENSIONS = [".png", ".jpg", ".webp"]
+
+
+def loose_lookup(image_dir, doc_id, page_number):
+    stem = os.path.join(image_dir, f"doc_{doc_id}_page_{page_number}_manual")
+    for extension in EXTENSIONS:
+        if os.path.exists(stem + extension):
+            with open(stem + extension, "rb") as f:
+                return f.read()
+    return None
+
+
+def directory_stats(path):
+    files = [os.path.join(root, f) for root, _, names in os.walk(path) for f in names]
+    return len(files), sum(os.path.getsize(f) for f in files) / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=40, help="pages per document")
+    parser.add_argument("--page-kb", type=int, default=150, help="encoded size of a page")
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    blob = rng.integers(0, 256, args.page_kb * 1024, dtype=np.uint8).tobytes()
+    loose_dir = tempfile.mkdtemp(prefix="loose_pages_")
+    store_dir = tempfile.mkdtemp(prefix="page_store_")
+    rows = []
+    try:
+        with Timer() as loose_write:
+            for doc_id in range(1, args.documents + 1):
+                for page_number in range(1, args.pages + 1):
+                    with open(os.path.join(loose_dir, f"doc_{doc_id}_page_{page_number}_manual.png"), "wb") as f:
+                        f.write(blob)
+        store = PageStore(store_dir)
+        with Timer() as store_write:
+            for doc_id in range(1, args.documents + 1):
+                for page_number in range(1, args.pages + 1):
+                    store.put(doc_id, page_number, blob)
+
+        targets = list(zip(rng.integers(1, args.documents + 1, args.lookups), rng.integers(1, args.pages + 1, args.lookups)))
+        lookups = {
+            "loose files": lambda doc_id, page_number: loose_lookup(loose_dir, doc_id, page_number),
+            "page store": store.get,
+        }
+        for name, lookup in lookups.items():
+            latencies = []
+            for doc_id, page_number in targets:
+                with Timer() as timer:
+                    data = lookup(int(doc_id), int(page_number))
+                assert data is not None and len(data) == len(blob)
+                latencies.append(timer.elapsed * 1e6)
+            files, megabytes = directory_stats(loose_dir if name == "loose files" else store_dir)
+            rows.append({
+                "layout": name,
+                "files": files,
+                "disk_mb": megabytes,
+                "write_s": (loose_write if name == "loose files" else store_write).elapsed,
+                "lookup_us_p50": float(np.median(latencies)),
+                "lookup_us_p95": float(np.percentile(latencies, 95)),
+            })
+        store.close()
+    finally:
+        shutil.rmtree(loose_dir, ignore_errors=True)
+        shutil.rmtree(store_dir, ignore_errors=True)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Scaling of multi-process page embedding.
+
+Embeds the same pages in-process and with ParallelImageEncoder at each worker
+count, reporting pages/sec, speedup over the in-process run and the largest
+difference from the in-process embeddings (which also checks page order).
+
+Usage:
+    python -m benchmarks.parallel_embedding --pdf uploads/manual.pdf --pages 64 --workers 1 2 4 8
+"""
+import argparse
+import numpy as np
+from core.colpali_client import ColpaliClient
+from core.parallel_embedding import ParallelImageEncoder
+from benchmarks.common import Timer, load_pages, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--pages", type=int, default=64)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-size", type=int, default=2, help="pages per worker task")
+    parser.add_argument("--batch-size", type=int, default=4, help="pages per forward pass in-process")
+    parser.add_argument("--profile", default="fp32")
+    args = parser.parse_args()
+
+    images = load_pages(args.pdf, args.pages)
+    client = ColpaliClient(profile=args.profile)
+    # Fork every pool before the first forward pass in this process, as MultiModalRAG does
+    encoders = {}
+    for workers in args.workers:
+        encoders[workers] = ParallelImageEncoder(client, workers, chunk_size=args.chunk_size)
+        encoders[workers].start()
+    client.get_image_embeddings(images[:1])
+
+    with Timer() as timer:
+        reference = []
+        for i in range(0, len(images), args.batch_size):
+            reference.extend(client.get_image_embeddings(images[i:i + args.batch_size]))
+    baseline = len(images) / timer.elapsed
+    rows = [{"workers": "in-process", "threads/worker": "all", "pages/sec": baseline, "speedup": 1.0, "max_diff": 0.0}]
+
+    for workers in args.workers:
+        encoder = encoders[workers]
+        # Run one chunk per worker before timing
+        encoder.get_image_embeddings(images[:workers])
+        with Timer() as timer:
+            embeddings = list(encoder.iter_image_embeddings(images))
+        encoder.close()
+        pps = len(images) / timer.elapsed
+        rows.append({
+            "workers": workers,
+            "threads/worker": encoder.threads_per_worker,
+            "pages/sec": pps,
+            "speedup": pps / baseline,
+            "max_diff": float(max(np.abs(np.asarray(a, np.float32) - np.asarray(b, np.float32)).max()
+                                  for a, b in zip(embeddings, reference))),
+        })
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
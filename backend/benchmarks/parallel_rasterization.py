@@ -0,0 +1,49 @@
+"""
+Rasterization throughput of PdfConverter by worker count.
+
+Converts the same PDFs with each --workers value, consuming pages as a stream
+the way the indexing path does, and reports pages per second. Page order and
+doc ids are checked to be identical to the single-process run.
+
+Usage:
+    python -m benchmarks.parallel_rasterization --pdf uploads/a.pdf uploads/b.pdf --workers 1 2 4
+"""
+import argparse
+import tempfile
+from benchmarks.common import Timer, print_table
+
+
+def main():
+    from core.utils import PdfConverter
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="+", required=True)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--window", type=int, default=8, help="pages per poppler call")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--poppler-path", default=None)
+    args = parser.parse_args()
+
+    doc_ids = list(range(1, len(args.pdf) + 1))
+    rows, baseline = [], None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as image_dir:
+            converter = PdfConverter(image_dir=image_dir, dpi=args.dpi, poppler_path=args.poppler_path,
+                                     page_window=args.window, workers=workers)
+            with Timer() as timer:
+                pages = converter.wait_saved(list(converter.iter_convert_many(args.pdf, doc_ids)))
+            order = [(page["doc_id"], page["page_number"]) for page in pages]
+            converter.close()
+        baseline = baseline or order
+        rows.append({
+            "workers": workers,
+            "pages": len(order),
+            "pages_per_sec": len(order) / timer.elapsed,
+            "seconds": timer.elapsed,
+            "same_order": order == baseline,
+        })
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Upsert throughput of multivector points over REST vs gRPC, sync vs async.
+
+Generates synthetic ColPali-shaped pages (1030 vectors of 128 dims by default)
+and upserts them into a fresh two-stage collection with each client. The sync
+client sends batches one after another; the async client keeps --concurrency
+batches in flight on the shared pooled client.
+
+Against ':memory:' only the sync in-process stand-in is measured, which shows
+the serialization cost but not the transport; use a local Qdrant for REST vs gRPC
+and the async rows:
+    docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant
+
+Usage:
+    python -m benchmarks.qdrant_transport --qdrant-url http://localhost:6333 --points 2000
+"""
+import argparse
+import asyncio
+import numpy as np
+from core.qdrant_client import VectorDBClient, AsyncVectorDBClient
+from benchmarks.common import Timer, print_table
+
+DIM = 128
+
+
+def make_points(rng, count, tokens):
+    return [
+        {"id": i, "vector": rng.standard_normal((tokens, DIM), dtype=np.float32), "payload": {"doc_id": i // 10, "page_num": i % 10 + 1}}
+        for i in range(count)
+    ]
+
+
+def reset_collection(qdrant, collection):
+    if qdrant.client.collection_exists(collection):
+        qdrant.client.delete_collection(collection)
+    qdrant.create_collection(name=collection)
+
+
+def run_sync(qdrant, points, collection, batch_size):
+    for i in range(0, len(points), batch_size):
+        qdrant.upsert_batch(points[i:i + batch_size], collection)
+
+
+async def run_async(client, points, collection, batch_size, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def send(batch):
+        async with slots:
+            await client.upsert_batch(batch, collection)
+
+    await asyncio.gather(*(send(points[i:i + batch_size]) for i in range(0, len(points), batch_size)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=500)
+    parser.add_argument("--tokens", type=int, default=1030, help="vectors per synthetic page")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--qdrant-url", default=":memory:")
+    parser.add_argument("--qdrant-api-key", default=None)
+    parser.add_argument("--grpc-port", type=int, default=6334)
+    args = parser.parse_args()
+
+    points = make_points(np.random.default_rng(0), args.points, args.tokens)
+    megabytes = sum(point["vector"].nbytes for point in points) / 1024 ** 2
+    transports = ["rest"] if args.qdrant_url == ":memory:" else ["rest", "grpc"]
+    collection = "bench_transport"
+
+    rows = []
+    for transport in transports:
+        prefer_grpc = transport == "grpc"
+        qdrant = VectorDBClient(args.qdrant_url, args.qdrant_api_key, prefer_grpc, args.grpc_port)
+
+        reset_collection(qdrant, collection)
+        with Timer() as timer:
+            run_sync(qdrant, points, collection, args.batch_size)
+        rows.append({"transport": transport, "client": "sync", "points_per_sec": args.points / timer.elapsed,
+                     "mb_per_sec": megabytes / timer.elapsed, "seconds": timer.elapsed})
+
+        # The async in-memory stand-in would be a separate, empty store
+        if args.qdrant_url != ":memory:":
+            reset_collection(qdrant, collection)
+            async_qdrant = AsyncVectorDBClient(args.qdrant_url, args.qdrant_api_key, prefer_grpc, args.grpc_port)
+            with Timer() as timer:
+                asyncio.run(run_async(async_qdrant, points, collection, args.batch_size, args.concurrency))
+            rows.append({"transport": transport, "client": f"async x{args.concurrency}", "points_per_sec": args.points / timer.elapsed,
+                         "mb_per_sec": megabytes / timer.elapsed, "seconds": timer.elapsed})
+        qdrant.client.delete_collection(collection)
+
+    print(f"{args.points} points of {args.tokens}x{DIM} float32 ({megabytes:.0f} MB), batches of {args.batch_size}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Per-query cost of batched vs one-at-a-time retrieval.
+
+Indexes the pages of a PDF, then runs the same queries two ways: each query
+embedded and searched on its own (as MultiModalRAG.query does), and all of
+them in one ColPali forward pass plus one query_batch_points call (as
+MultiModalRAG.query_batch does). Results of both paths are checked to match.
+
+Usage:
+    python -m benchmarks.query_batch --pdf uploads/manual.pdf --repeat 4
+"""
+import argparse
+from core.colpali_client import ColpaliClient
+from core.qdrant_client import VectorDBClient
+from benchmarks.common import DEFAULT_QUERIES, Timer, load_pages, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--pages", type=int, default=20, help="max pages to index")
+    parser.add_argument("--repeat", type=int, default=2, help="times to repeat the default query set")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--qdrant-url", default=":memory:")
+    parser.add_argument("--qdrant-api-key", default=None)
+    args = parser.parse_args()
+
+    colpali = ColpaliClient()
+    qdrant = VectorDBClient(args.qdrant_url, args.qdrant_api_key)
+    collection = "bench_query_batch"
+    if qdrant.client.collection_exists(collection):
+        qdrant.client.delete_collection(collection)
+    qdrant.create_collection(name=collection)
+
+    images = load_pages(args.pdf, args.pages)
+    dataset = [{"image": image, "doc_id": 1, "page_number": n + 1, "filename": args.pdf} for n, image in enumerate(images)]
+    points = qdrant.create_points(colpali, dataset, batch_size=4, prefetch_pooling="mean")
+    qdrant.insert_data(points, dataset, batch_size=8, collection_name=collection)
+
+    queries = DEFAULT_QUERIES * args.repeat
+    # Warm up both paths so neither pays for lazy initialization
+    qdrant.search(colpali.get_query_embeddings(queries[0]), collection_name=collection, prefetch_limit=100)
+
+    with Timer() as sequential:
+        single = [
+            qdrant.search(colpali.get_query_embeddings(query), collection_name=collection,
+                          prefetch_limit=100, limit=args.top_k).points
+            for query in queries
+        ]
+    with Timer() as batched:
+        embeddings = colpali.get_query_embeddings_batch(queries)
+        responses = qdrant.search_batch(embeddings, collection_name=collection, prefetch_limit=100, limit=args.top_k)
+    batch = [response.points for response in responses]
+
+    same = sum([p.id for p in a] == [p.id for p in b] for a, b in zip(single, batch))
+    rows = [
+        {"mode": "one at a time", "queries": len(queries), "total_s": sequential.elapsed,
+         "ms_per_query": sequential.elapsed * 1000 / len(queries)},
+        {"mode": "query_batch", "queries": len(queries), "total_s": batched.elapsed,
+         "ms_per_query": batched.elapsed * 1000 / len(queries)},
+    ]
+    print_table(rows)
+    print(f"Identical rankings: {same}/{len(queries)}")
+    qdrant.client.delete_collection(collection)
+
+
+if __name__ == "__main__":
+    main()
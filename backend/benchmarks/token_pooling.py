@@ -0,0 +1,115 @@
+"""
+Evaluate index-time token pooling on your own PDFs.
+
+Pages are embedded once with ColPali, then indexed at each pool factor. For
+every factor the script reports vector storage size, mean/p95 search latency
+and recall@5.
+
+Recall@5 is computed against --qrels when given, a JSON object mapping each
+query to its relevant pages as "<filename>:<page_number>". Without qrels the
+unpooled (factor 1) top 5 is used as the reference.
+
+Usage:
+    python -m benchmarks.token_pooling --pdfs uploads/ --factors 1 2 3 4 8
+    python -m benchmarks.token_pooling --pdfs uploads/manual.pdf --qrels qrels.json --method sequential
+"""
+import argparse
+import json
+import os
+import numpy as np
+from core.colpali_client import ColpaliClient
+from core.pooling import TokenPooler, POOL_METHODS
+from core.qdrant_client import VectorDBClient
+from benchmarks.common import DEFAULT_QUERIES, Timer, load_pages, print_table
+
+
+def collect_pdfs(paths):
+    pdfs = []
+    for path in paths:
+        if os.path.isdir(path):
+            pdfs.extend(sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(".pdf")))
+        else:
+            pdfs.append(path)
+    return pdfs
+
+
+def embed_pages(client: ColpaliClient, pdfs, max_pages, batch_size):
+    keys, embeddings = [], []
+    for pdf in pdfs:
+        images = load_pages(pdf, max_pages)
+        for i in range(0, len(images), batch_size):
+            embeddings.extend(client.get_image_embeddings(images[i:i + batch_size]))
+        keys.extend(f"{os.path.basename(pdf)}:{n + 1}" for n in range(len(images)))
+        print(f"[INFO] Embedded {len(images)} pages from {pdf}")
+    return keys, embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", nargs="+", required=True, help="PDF files or folders")
+    parser.add_argument("--pages", type=int, default=None, help="max pages per PDF")
+    parser.add_argument("--factors", nargs="+", type=int, default=[1, 2, 3, 4, 8])
+    parser.add_argument("--method", default="hierarchical", choices=POOL_METHODS)
+    parser.add_argument("--qrels", help="JSON mapping query -> relevant '<filename>:<page>' keys")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--qdrant-url", default=":memory:")
+    parser.add_argument("--qdrant-api-key", default=None)
+    args = parser.parse_args()
+
+    qrels = None
+    if args.qrels:
+        with open(args.qrels) as f:
+            qrels = json.load(f)
+    queries = list(qrels) if qrels else DEFAULT_QUERIES
+
+    client = ColpaliClient()
+    keys, page_embeddings = embed_pages(client, collect_pdfs(args.pdfs), args.pages, args.batch_size)
+    query_embeddings = [client.get_query_embeddings(q) for q in queries]
+
+    factors = sorted(set(args.factors) | ({1} if not qrels else set()))
+    qdrant = VectorDBClient(args.qdrant_url, args.qdrant_api_key)
+    reference = None
+    rows = []
+    for factor in factors:
+        pooler = TokenPooler(factor, args.method)
+        pooled = pooler.pool(page_embeddings)
+        collection = f"bench_pooling_{factor}"
+        if qdrant.client.collection_exists(collection):
+            qdrant.client.delete_collection(collection)
+        qdrant.create_collection(name=collection)
+        points = [
+            {"id": i, "vector": vectors, "payload": {"key": key, "pool_factor": factor}}
+            for i, (key, vectors) in enumerate(zip(keys, pooled))
+        ]
+        qdrant.insert_data(points, [], batch_size=16, collection_name=collection)
+
+        latencies, top5 = [], []
+        for embedding in query_embeddings:
+            with Timer() as timer:
+                response = qdrant.search(embedding, collection_name=collection)
+            latencies.append(timer.elapsed * 1000)
+            top5.append([point.payload["key"] for point in response.points[:5]])
+
+        if qrels:
+            recall = np.mean([
+                len(set(hits) & set(qrels[q])) / max(1, len(qrels[q])) for q, hits in zip(queries, top5)
+            ])
+        else:
+            reference = reference or top5
+            recall = np.mean([len(set(hits) & set(ref)) / max(1, len(ref)) for hits, ref in zip(top5, reference)])
+
+        vectors = sum(v.shape[0] for v in pooled)
+        rows.append({
+            "factor": factor,
+            "vectors/page": vectors / len(pooled),
+            "storage_MB": vectors * pooled[0].shape[1] * 4 / (1024 * 1024),
+            "latency_ms_mean": float(np.mean(latencies)),
+            "latency_ms_p95": float(np.percentile(latencies, 95)),
+            "recall@5": float(recall),
+        })
+        qdrant.client.delete_collection(collection)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Latency vs recall of two-stage retrieval (pooled prefetch + MaxSim rerank).
+
+Builds synthetic corpora of clustered page multivectors at each size and
+compares full MaxSim search against two-stage search at several prefetch
+depths. Recall@5 is measured against the full MaxSim top 5.
+
+Synthetic pages default to 64 vectors of 128 dims so 100k pages fit in memory;
+use --tokens 1030 to match real ColPali pages on a large Qdrant instance.
+Local ':memory:' mode is brute force in Python, so use a real Qdrant server
+(--qdrant-url) for the larger sizes.
+
+Usage:
+    python -m benchmarks.two_stage_retrieval --qdrant-url http://localhost:6333 --sizes 1000 10000 100000
+"""
+import argparse
+import numpy as np
+from core.qdrant_client import VectorDBClient
+from benchmarks.common import Timer, print_table
+
+DIM = 128
+
+
+def make_corpus(rng, pages, tokens, topics):
+    """
+    Pages drawn around random topic centres so nearest neighbours are meaningful.
+    """
+    centres = rng.standard_normal((topics, DIM), dtype=np.float32)
+    labels = rng.integers(0, topics, size=pages)
+    for start in range(0, pages, 1000):
+        chunk = labels[start:start + 1000]
+        noise = rng.standard_normal((len(chunk), tokens, DIM), dtype=np.float32)
+        yield chunk, centres[chunk][:, None, :] + 1.5 * noise
+
+
+def make_queries(rng, count, tokens, topics):
+    centres = rng.standard_normal((topics, DIM), dtype=np.float32)
+    return [centres[rng.integers(0, topics)] + rng.standard_normal((tokens, DIM), dtype=np.float32) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--prefetch", nargs="+", type=int, default=[50, 100, 200, 500])
+    parser.add_argument("--tokens", type=int, default=64, help="vectors per synthetic page")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--qdrant-url", default=":memory:")
+    parser.add_argument("--qdrant-api-key", default=None)
+    args = parser.parse_args()
+
+    qdrant = VectorDBClient(args.qdrant_url, args.qdrant_api_key)
+    rows = []
+    for size in args.sizes:
+        # Same seed for corpus and queries so topic centres line up
+        rng = np.random.default_rng(size)
+        collection = f"bench_two_stage_{size}"
+        if qdrant.client.collection_exists(collection):
+            qdrant.client.delete_collection(collection)
+        qdrant.create_collection(name=collection, two_stage=True)
+        next_id = 0
+        for labels, vectors in make_corpus(rng, size, args.tokens, args.topics):
+            points = [
+                {"id": next_id + i, "vector": page, "payload": {"topic": int(label)}}
+                for i, (label, page) in enumerate(zip(labels, vectors))
+            ]
+            qdrant.insert_data(points, [], batch_size=64, collection_name=collection)
+            next_id += len(points)
+
+        rng = np.random.default_rng(size)
+        queries = make_queries(rng, args.queries, 16, args.topics)
+
+        def run(prefetch_limit):
+            latencies, results = [], []
+            for query in queries:
+                with Timer() as timer:
+                    response = qdrant.search(query, collection_name=collection, prefetch_limit=prefetch_limit)
+                latencies.append(timer.elapsed * 1000)
+                results.append([point.id for point in response.points])
+            return latencies, results
+
+        full_latencies, exact = run(None)
+        rows.append({"pages": size, "prefetch": "full", "latency_ms_p50": float(np.median(full_latencies)),
+                     "latency_ms_p95": float(np.percentile(full_latencies, 95)), "recall@5": 1.0})
+        for depth in args.prefetch:
+            latencies, results = run(depth)
+            recall = np.mean([len(set(r) & set(e)) / max(1, len(e)) for r, e in zip(results, exact)])
+            rows.append({"pages": size, "prefetch": depth, "latency_ms_p50": float(np.median(latencies)),
+                         "latency_ms_p95": float(np.percentile(latencies, 95)), "recall@5": float(recall)})
+        qdrant.client.delete_collection(collection)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from passlib.context import CryptContext
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
 import os
 from dotenv import load_dotenv
 
@@ -8,6 +10,36 @@ load_dotenv()
 db = SQLAlchemy()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+def add_missing_columns():
+    """
+    Add model columns that existing tables lack, since create_all only creates missing tables.
+    Only nullable columns are added, with their indexes; running it again changes nothing.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in present]
+        for column in missing:
+            if not column.nullable:
+                print(f"Column {table.name}.{column.name} is missing and not nullable, add it manually.")
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    for index in table.indexes:
+                        if [indexed.name for indexed in index.columns] == [column.name]:
+                            connection.execute(CreateIndex(index))
+            except Exception:
+                # Another worker starting at the same time may have added it first
+                if column.name not in {c["name"] for c in inspect(db.engine).get_columns(table.name)}:
+                    raise
+                continue
+            print(f"Added column {table.name}.{column.name}.")
+
 def init_database(app):
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("MYSQL_DATABASE_URL")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
@@ -15,4 +47,5 @@ def init_database(app):
     
     with app.app_context():
         db.create_all()
-        print("Database tables created/checked.")
\ No newline at end of file
+        add_missing_columns()
+        print("Database tables created/checked.")
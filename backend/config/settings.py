@@ -19,4 +19,84 @@ class Config:
 load_dotenv()
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
-TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
\ No newline at end of file
+TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+
+# ColPali query micro-batching
+QUERY_BATCH_ENABLED = os.getenv("QUERY_BATCH_ENABLED", "false").lower() == "true"
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "8"))
+QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", "10"))
+
+# ColPali inference profile: fp32, bf16, int8 or compile
+COLPALI_PROFILE = os.getenv("COLPALI_PROFILE", "bf16")
+COLPALI_NUM_THREADS = int(os.getenv("COLPALI_NUM_THREADS", "0")) or None
+# In-memory dtype of page embeddings between the model and the Qdrant upsert: float32 or float16
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float32")
+
+# Query embedding cache: "memory", "disk" (shared by all workers on the host) or "none"
+QUERY_CACHE_BACKEND = os.getenv("QUERY_CACHE_BACKEND", "memory").lower()
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "./model_cache/query_cache.sqlite")
+
+# Index-time token pooling of page multivectors (1 disables pooling)
+POOL_FACTOR = int(os.getenv("POOL_FACTOR", "1"))
+POOL_METHOD = os.getenv("POOL_METHOD", "hierarchical")
+
+# Content-addressed page embedding store ("" disables it)
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "./model_cache/page_embeddings")
+EMBEDDING_STORE_MAX_GB = float(os.getenv("EMBEDDING_STORE_MAX_GB", "5"))
+
+# Adaptive page embedding batch size
+EMBED_BATCH_MIN = int(os.getenv("EMBED_BATCH_MIN", "1"))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "32"))
+EMBED_MEMORY_FRACTION = float(os.getenv("EMBED_MEMORY_FRACTION", "0.5"))
+# Worker processes for page embedding (1 embeds in-process) and their thread budget (0 splits the CPUs evenly)
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+EMBED_THREADS_PER_WORKER = int(os.getenv("EMBED_THREADS_PER_WORKER", "0")) or None
+
+# Build and warm the RAG models in the background at startup (otherwise on first use)
+RAG_WARMUP = os.getenv("RAG_WARMUP", "true").lower() == "true"
+
+# PDF rasterization: display/Gemini DPI, embedding copy size (0 keeps full resolution) and poppler location
+PDF_DPI = int(os.getenv("PDF_DPI", "200"))
+PDF_EMBED_SIZE = int(os.getenv("PDF_EMBED_SIZE", "448"))
+POPPLER_PATH = os.getenv("POPPLER_PATH") or None
+# Pages rasterized per poppler call while streaming a PDF (0 converts the whole file at once)
+PDF_PAGE_WINDOW = int(os.getenv("PDF_PAGE_WINDOW", "8"))
+# Worker processes rasterizing PDF page windows in parallel (1 converts in-process)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))
+# Codec of saved page images (png, jpeg or webp); quality applies to jpeg/webp, compress level (0-9) to png
+PDF_IMAGE_FORMAT = os.getenv("PDF_IMAGE_FORMAT", "png")
+PDF_IMAGE_QUALITY = int(os.getenv("PDF_IMAGE_QUALITY", "90"))
+PDF_PNG_COMPRESS_LEVEL = int(os.getenv("PDF_PNG_COMPRESS_LEVEL", "6"))
+# Folder of the packed page image store, one <document id>.pages file per document
+PAGE_STORE_DIR = os.getenv("PAGE_STORE_DIR", os.path.join(Config.UPLOAD_FOLDER, "pdf_images"))
+
+# Two-stage retrieval: candidates prefetched with pooled vectors before MaxSim rerank (0 disables), pooling "mean" or "rows"
+PREFETCH_LIMIT = int(os.getenv("PREFETCH_LIMIT", "100"))
+PREFETCH_POOLING = os.getenv("PREFETCH_POOLING", "mean")
+
+# Vector quantization: "scalar" (int8), "binary" or "none"; search-time use, oversampling and rescoring
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "scalar").lower()
+QDRANT_USE_QUANTIZATION = os.getenv("QDRANT_USE_QUANTIZATION", "true").lower() == "true"
+QDRANT_OVERSAMPLING = float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
+QDRANT_RESCORE = os.getenv("QDRANT_RESCORE", "true").lower() == "true"
+
+# Streaming ingestion: pages buffered between stages, concurrent async upserts and points per upsert
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "8"))
+
+# Search results: default pages per query, upper bound accepted from requests and minimum MaxSim score (empty disables)
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", "5"))
+SEARCH_MAX_TOP_K = int(os.getenv("SEARCH_MAX_TOP_K", "20"))
+SEARCH_SCORE_THRESHOLD = float(os.getenv("SEARCH_SCORE_THRESHOLD")) if os.getenv("SEARCH_SCORE_THRESHOLD") else None
+
+# Qdrant transport: gRPC instead of REST, its port, and a shared async client for awaitable search/upsert
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_ASYNC = os.getenv("QDRANT_ASYNC", "false").lower() == "true"
+
+# Vector store: "qdrant" or "local" (embedded NumPy MaxSim engine) and where the local engine keeps its files
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "./model_cache/local_index")
@@ -0,0 +1,89 @@
+import gc
+import psutil
+from typing import List
+
+#Rough activation memory ColPali needs per page on top of the decoded image
+DEFAULT_PAGE_OVERHEAD_BYTES=256*1024**2
+#Weight of the newest batch in the per-page latency baseline
+LATENCY_SMOOTHING=0.3
+
+
+def is_out_of_memory(error:Exception)->bool:
+    '''
+    True for host or accelerator allocation failures raised during a forward pass
+    '''
+    if isinstance(error,MemoryError):
+        return True
+    message=str(error).lower()
+    return "out of memory" in message or "can't allocate memory" in message
+
+
+class AdaptiveBatchSizer:
+    '''
+    Picks the page embedding batch size from available memory and measured latency.
+
+    The batch size is capped by how many pages fit in memory_fraction of the
+    available RAM. Below that cap it grows by one page per batch, and backs off when
+    per-page latency is more than 10% worse than at one page less. Latency is an
+    exponentially weighted average per batch size, so one unusually fast or slow
+    batch does not hold the size down for good.
+    On out-of-memory errors the size is halved and the batch retried.
+    '''
+    def __init__(self,min_size:int=1,max_size:int=32,initial_size:int=None,
+                 memory_fraction:float=0.5,page_overhead_bytes:int=DEFAULT_PAGE_OVERHEAD_BYTES):
+        self.min_size=max(1,min_size)
+        self.max_size=max(self.min_size,max_size)
+        self.memory_fraction=memory_fraction
+        self.page_overhead_bytes=page_overhead_bytes
+        self.size=initial_size
+        self._page_seconds={}
+        self.history=[]
+
+    def _memory_cap(self,images:List)->int:
+        '''
+        Largest batch that fits in the available memory budget for pages like these
+        '''
+        available=psutil.virtual_memory().available*self.memory_fraction
+        image_bytes=max((image.size[0]*image.size[1]*3 for image in images if image is not None),default=0)
+        per_page=image_bytes+self.page_overhead_bytes
+        return max(self.min_size,min(self.max_size,int(available//per_page)))
+
+    def next_size(self,images:List)->int:
+        '''
+        Batch size to use for the next batch, given a sample of upcoming pages
+        '''
+        cap=self._memory_cap(images)
+        if self.size is None:
+            self.size=max(self.min_size,cap//2)
+        self.size=max(self.min_size,min(self.size,cap))
+        return self.size
+
+    def record(self,batch_size:int,seconds:float)->None:
+        '''
+        Feed back the latency of a completed batch; only batches that ran a full forward pass belong here
+        '''
+        page_seconds=seconds/max(1,batch_size)
+        self.history.append((batch_size,seconds))
+        previous=self._page_seconds.get(batch_size)
+        if previous is not None:
+            page_seconds=previous+LATENCY_SMOOTHING*(page_seconds-previous)
+        self._page_seconds[batch_size]=page_seconds
+        smaller=self._page_seconds.get(batch_size-1)
+        if smaller is not None and page_seconds>smaller*1.1:
+            #Larger batches stopped helping, step back and measure the smaller size again
+            self.size=max(self.min_size,batch_size-1)
+        else:
+            self.size=min(self.max_size,batch_size+1)
+
+    def on_oom(self,batch_size:int)->int:
+        '''
+        Halve the batch size after an out-of-memory error and return the new size.
+        max_size is left as configured: the error may be transient, e.g. another request
+        embedding at the same time, and latency feedback grows the size back from here.
+        '''
+        if batch_size<=self.min_size:
+            raise MemoryError(f"Out of memory at the minimum batch size of {self.min_size}")
+        gc.collect()
+        self.size=max(self.min_size,batch_size//2)
+        print(f"[WARNING] Out of memory at batch size {batch_size}, retrying with {self.size}")
+        return self.size
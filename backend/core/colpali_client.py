@@ -1,45 +1,111 @@
 import torch
+import numpy as np
 from typing import List
 from colpali_engine.models import ColPali,ColPaliProcessor
 
+# Inference profiles selectable on ColpaliClient
+PROFILE_DTYPES={
+    "fp32":torch.float32,
+    "bf16":torch.bfloat16,
+    "int8":torch.float32, #dynamic quantization starts from fp32 weights
+    "compile":torch.float32
+}
+
 class ColpaliClient:
-    def __init__(self,model_name:str='vidore/colpali-v1.3',cache_dir:str="./model_cache"):
+    def __init__(self,model_name:str='vidore/colpali-v1.3',cache_dir:str="./model_cache",
+                 profile:str="bf16",num_threads:int=None,embedding_dtype:str="float32"):
+        if profile not in PROFILE_DTYPES:
+            raise ValueError(f"Unknown inference profile '{profile}', expected one of {list(PROFILE_DTYPES)}")
         
         #Define the available device
         device='cuda' if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
         self.device=device
+        self.model_name=model_name
+        self.profile=profile
+        #Embeddings leave the model as contiguous float32/float16 arrays
+        self.embedding_dtype=np.dtype(embedding_dtype)
+        
+        #Intra-op thread budget for CPU matmuls
+        if num_threads:
+            torch.set_num_threads(num_threads)
         
         #Declare the colpali model
         self.model=ColPali.from_pretrained(
             pretrained_model_name_or_path=model_name,
-            torch_dtype=torch.bfloat16,
+            torch_dtype=PROFILE_DTYPES[profile],
             device_map=self.device,
             cache_dir=cache_dir,
             #Use if using only CPU is used
             low_cpu_mem_usage=True #remove this if using GPU
         )
+        self.model.eval()
+        self._apply_profile()
         
         self.processor=ColPaliProcessor.from_pretrained(
             pretrained_model_name_or_path=model_name,
             cache_dir=cache_dir
         )
+        print(f"[INFO] ColPali loaded on {self.device} with '{self.profile}' profile, {torch.get_num_threads()} threads")
+    
+    @property
+    def model_key(self)->str:
+        '''
+        Identifies the model revision and profile that produced an embedding, used by caches
+        '''
+        return f"{self.model_name}:{self.profile}"
     
-    def get_image_embeddings(self,images:List)->List[List[float]]:
+    @property
+    def embedding_key(self)->str:
+        '''
+        model_key plus the output dtype, for caches that hand back stored embeddings as they were produced
+        '''
+        return f"{self.model_key}:{self.embedding_dtype.name}"
+    
+    def _apply_profile(self)->None:
+        '''
+        Apply post-load optimizations for the selected inference profile
+        '''
+        if self.profile=="int8":
+            if self.device!="cpu":
+                print(f"[WARNING] int8 dynamic quantization is CPU-only, running fp32 on {self.device}")
+                return
+            torch.ao.quantization.quantize_dynamic(self.model,{torch.nn.Linear},dtype=torch.qint8,inplace=True)
+        elif self.profile=="compile":
+            self.model=torch.compile(self.model)
+    
+    def _to_array(self,embedding:torch.Tensor)->np.ndarray:
+        '''
+        Convert a (tokens, dim) tensor to a contiguous NumPy array of the configured dtype
+        '''
+        return np.ascontiguousarray(embedding.cpu().float().numpy(),dtype=self.embedding_dtype)
+    
+    def get_image_embeddings(self,images:List)->List[np.ndarray]:
         '''
         Creates embeddings for the given image or list of images using Colpali
         '''
         with torch.no_grad():
             image_inputs=self.processor.process_images(images).to(self.model.device)
             image_embeddings=self.model(**image_inputs)
-        embeddings=[embedding.cpu().float().numpy().tolist() for embedding in image_embeddings]
+        embeddings=[self._to_array(embedding) for embedding in image_embeddings]
         return embeddings
         
-    def get_query_embeddings(self,query:str)->List:
+    def get_query_embeddings(self,query:str)->np.ndarray:
+        '''
+        Creates embeddings for the given text query using Colpali
+        '''
+        return self.get_query_embeddings_batch([query])[0]
+
+    def get_query_embeddings_batch(self,queries:List[str])->List[np.ndarray]:
         '''
-        Creates embeddings for the given text query or list of queries using Colpali
+        Creates embeddings for a list of text queries in a single forward pass.
+        Padding tokens are trimmed so each result matches its unbatched embedding.
         '''
         with torch.no_grad():
-            text_embeddings=self.processor.process_queries([query]).to(self.model.device)
-            text_embeddings=self.model(**text_embeddings)
-        query_embeddings=text_embeddings[0].cpu().float().numpy().tolist()
+            text_inputs=self.processor.process_queries(queries).to(self.model.device)
+            text_embeddings=self.model(**text_inputs)
+        attention_mask=text_inputs["attention_mask"].bool()
+        query_embeddings=[
+            self._to_array(embedding[mask])
+            for embedding,mask in zip(text_embeddings,attention_mask)
+        ]
         return query_embeddings
\ No newline at end of file
@@ -0,0 +1,226 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict,List,Optional
+import numpy as np
+
+#Inserts between two size checks of the disk cache; it may overshoot max_entries by this much per process
+DISK_PRUNE_EVERY=64
+#Part of every key; bumped when the stored value layout changes so old entries are never decoded
+CACHE_FORMAT=2
+
+
+def normalize_query(query:str)->str:
+    '''
+    Normalize query text so trivially different phrasings share a cache entry
+    '''
+    text=unicodedata.normalize("NFKC",query).casefold()
+    text=re.sub(r"\s+"," ",text).strip()
+    return text.rstrip("?!. ")
+
+
+class MemoryCacheBackend:
+    '''
+    In-process LRU store with per-entry expiry
+    '''
+    def __init__(self,max_entries:int=1024,ttl_seconds:float=3600):
+        self.max_entries=max_entries
+        self.ttl=ttl_seconds
+        self._entries=OrderedDict()
+        self._lock=threading.Lock()
+        self.evictions=0
+        self.expirations=0
+
+    def get(self,key:str)->Optional[bytes]:
+        with self._lock:
+            entry=self._entries.get(key)
+            if entry is None:
+                return None
+            value,created=entry
+            if self.ttl and time.time()-created>self.ttl:
+                del self._entries[key]
+                self.expirations+=1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self,key:str,value:bytes)->None:
+        with self._lock:
+            self._entries[key]=(value,time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries)>self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions+=1
+
+    def __len__(self)->int:
+        return len(self._entries)
+
+
+class DiskCacheBackend:
+    '''
+    SQLite-backed LRU store shared by every worker process on the host.
+    The entry count is checked every DISK_PRUNE_EVERY inserts instead of on each one.
+    '''
+    def __init__(self,path:str,max_entries:int=100000,ttl_seconds:float=3600):
+        self.path=path
+        self.max_entries=max_entries
+        self.ttl=ttl_seconds
+        self._local=threading.local()
+        self._lock=threading.Lock()
+        self._inserts=0
+        self.evictions=0
+        self.expirations=0
+        os.makedirs(os.path.dirname(os.path.abspath(path)),exist_ok=True)
+        conn=self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_query_cache_accessed ON query_cache(accessed)")
+        conn.commit()
+
+    def _conn(self)->sqlite3.Connection:
+        # sqlite connections cannot be shared across threads
+        conn=getattr(self._local,"conn",None)
+        if conn is None:
+            conn=sqlite3.connect(self.path,timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn=conn
+        return conn
+
+    def get(self,key:str)->Optional[bytes]:
+        conn=self._conn()
+        row=conn.execute("SELECT value, created FROM query_cache WHERE key=?",(key,)).fetchone()
+        if row is None:
+            return None
+        value,created=row
+        now=time.time()
+        if self.ttl and now-created>self.ttl:
+            conn.execute("DELETE FROM query_cache WHERE key=?",(key,))
+            conn.commit()
+            with self._lock:
+                self.expirations+=1
+            return None
+        conn.execute("UPDATE query_cache SET accessed=? WHERE key=?",(now,key))
+        conn.commit()
+        return value
+
+    def set(self,key:str,value:bytes)->None:
+        conn=self._conn()
+        now=time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO query_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+            (key,value,now,now)
+        )
+        with self._lock:
+            self._inserts+=1
+            prune=self._inserts%DISK_PRUNE_EVERY==0
+        if prune:
+            overflow=len(self)-self.max_entries
+            if overflow>0:
+                conn.execute(
+                    "DELETE FROM query_cache WHERE key IN "
+                    "(SELECT key FROM query_cache ORDER BY accessed ASC LIMIT ?)",
+                    (overflow,)
+                )
+                with self._lock:
+                    self.evictions+=overflow
+        conn.commit()
+
+    def __len__(self)->int:
+        return self._conn().execute("SELECT COUNT(*) FROM query_cache").fetchone()[0]
+
+
+class QueryEmbeddingCache:
+    '''
+    Bounded cache in front of a query encoder (ColpaliClient or QueryBatcher),
+    keyed on normalized query text plus the model name, inference profile and output dtype
+    '''
+    def __init__(self,encoder,model_key:str,backend:str="memory",max_entries:int=1024,
+                 ttl_seconds:float=3600,path:str="./model_cache/query_cache.sqlite"):
+        self.encoder=encoder
+        self.model_key=model_key
+        if backend=="memory":
+            self.backend=MemoryCacheBackend(max_entries,ttl_seconds)
+        elif backend=="disk":
+            self.backend=DiskCacheBackend(path,max_entries,ttl_seconds)
+        else:
+            raise ValueError(f"Unknown query cache backend '{backend}', expected 'memory' or 'disk'")
+        self.hits=0
+        self.misses=0
+        # Called from request threads and the batcher thread at once
+        self._lock=threading.Lock()
+
+    def _count(self,hits:int,misses:int)->None:
+        with self._lock:
+            self.hits+=hits
+            self.misses+=misses
+
+    def _key(self,query:str)->str:
+        raw=f"{CACHE_FORMAT}\x00{self.model_key}\x00{normalize_query(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _encode(embedding)->bytes:
+        # Keep the encoder's dtype so a hit returns the same array as the miss that stored it
+        array=np.ascontiguousarray(embedding)
+        header=np.array(array.shape,dtype=np.int32).tobytes()+array.dtype.str.encode("ascii").ljust(4)
+        return header+array.tobytes()
+
+    @staticmethod
+    def _decode(value:bytes)->np.ndarray:
+        rows,dim=np.frombuffer(value[:8],dtype=np.int32)
+        dtype=np.dtype(value[8:12].decode("ascii").strip())
+        return np.frombuffer(value[12:],dtype=dtype).reshape(rows,dim)
+
+    def get_query_embeddings(self,query:str)->np.ndarray:
+        '''
+        Return the cached embedding for the query, encoding and storing it on a miss
+        '''
+        key=self._key(query)
+        cached=self.backend.get(key)
+        if cached is not None:
+            self._count(1,0)
+            return self._decode(cached)
+        self._count(0,1)
+        embedding=self.encoder.get_query_embeddings(query)
+        self.backend.set(key,self._encode(embedding))
+        return embedding
+
+    def get_query_embeddings_batch(self,queries:List[str])->List[np.ndarray]:
+        '''
+        Return embeddings for all queries, encoding only the misses in one batch
+        '''
+        keys=[self._key(query) for query in queries]
+        cached=[self.backend.get(key) for key in keys]
+        embeddings=[None if value is None else self._decode(value) for value in cached]
+        missing=[i for i,embedding in enumerate(embeddings) if embedding is None]
+        self._count(len(queries)-len(missing),len(missing))
+        if missing:
+            computed=self.encoder.get_query_embeddings_batch([queries[i] for i in missing])
+            for i,embedding in zip(missing,computed):
+                self.backend.set(keys[i],self._encode(embedding))
+                embeddings[i]=embedding
+        return embeddings
+
+    def stats(self)->Dict:
+        '''
+        Return hit/miss and eviction counters
+        '''
+        with self._lock:
+            hits,misses=self.hits,self.misses
+        lookups=hits+misses
+        return {
+            "hits":hits,
+            "misses":misses,
+            "hit_rate":hits/lookups if lookups else 0.0,
+            "entries":len(self.backend),
+            "evictions":self.backend.evictions,
+            "expirations":self.backend.expirations
+        }
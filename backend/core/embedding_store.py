@@ -0,0 +1,195 @@
+import argparse
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import List,Dict,Optional
+import numpy as np
+
+#Eviction trims the store to this fraction of max_bytes, so it does not rescan on every put once full
+EVICT_LOW_WATER=0.9
+
+
+def page_hash(image,model_key:str)->str:
+    '''
+    Content hash of a rasterized page for the given model revision
+    '''
+    digest=hashlib.sha256()
+    digest.update(model_key.encode("utf-8"))
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class EmbeddingStore:
+    '''
+    Content-addressed on-disk store of page embeddings.
+    Each entry is a .npy file named after its page hash and read back memory-mapped.
+    Least recently used entries are evicted once the store exceeds max_bytes, down to
+    EVICT_LOW_WATER of it.
+    '''
+    def __init__(self,root:str,max_bytes:int=5*1024**3):
+        self.root=root
+        self.max_bytes=max_bytes
+        self.hits=0
+        self.misses=0
+        self._lock=threading.Lock()
+        os.makedirs(self.root,exist_ok=True)
+        self._size=sum(entry["bytes"] for entry in self._entries())
+
+    def _path(self,key:str)->str:
+        return os.path.join(self.root,key[:2],f"{key}.npy")
+
+    def _entries(self)->List[Dict]:
+        entries=[]
+        for shard in os.listdir(self.root):
+            shard_dir=os.path.join(self.root,shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith(".npy"):
+                    continue
+                path=os.path.join(shard_dir,name)
+                try:
+                    stat=os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append({"path":path,"bytes":stat.st_size,"used":stat.st_mtime})
+        return entries
+
+    def get(self,key:str)->Optional[np.ndarray]:
+        '''
+        Return the stored embedding as a read-only memory-mapped array, or None
+        '''
+        path=self._path(key)
+        try:
+            embedding=np.load(path,mmap_mode="r")
+        except (FileNotFoundError,ValueError):
+            with self._lock:
+                self.misses+=1
+            return None
+        #mtime doubles as the last-used timestamp for eviction
+        os.utime(path)
+        with self._lock:
+            self.hits+=1
+        return embedding
+
+    def put(self,key:str,embedding:np.ndarray)->None:
+        '''
+        Atomically write an embedding and evict old entries if the store is over budget
+        '''
+        path=self._path(key)
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        tmp_path=f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path,"wb") as f:
+            np.save(f,np.ascontiguousarray(embedding))
+        with self._lock:
+            #An overwritten entry no longer counts towards the store size
+            try:
+                previous=os.path.getsize(path)
+            except FileNotFoundError:
+                previous=0
+            os.replace(tmp_path,path)
+            self._size+=os.path.getsize(path)-previous
+            over_budget=self._size>self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self,target_bytes:int=None)->int:
+        '''
+        Remove least recently used entries until the store fits in target_bytes,
+        by default EVICT_LOW_WATER of max_bytes. Returns the number of entries removed.
+        '''
+        target=int(self.max_bytes*EVICT_LOW_WATER) if target_bytes is None else target_bytes
+        with self._lock:
+            entries=sorted(self._entries(),key=lambda entry:entry["used"])
+            total=sum(entry["bytes"] for entry in entries)
+            removed=0
+            for entry in entries:
+                if total<=target:
+                    break
+                try:
+                    os.remove(entry["path"])
+                except FileNotFoundError:
+                    pass
+                total-=entry["bytes"]
+                removed+=1
+            self._size=total
+        if removed:
+            print(f"[INFO] Evicted {removed} page embeddings from {self.root}")
+        return removed
+
+    def stats(self)->Dict:
+        '''
+        Return entry count, size on disk and hit/miss counters
+        '''
+        entries=self._entries()
+        with self._lock:
+            hits,misses=self.hits,self.misses
+        lookups=hits+misses
+        return {
+            "root":self.root,
+            "entries":len(entries),
+            "bytes":sum(entry["bytes"] for entry in entries),
+            "max_bytes":self.max_bytes,
+            "oldest_use":min((entry["used"] for entry in entries),default=None),
+            "hits":hits,
+            "misses":misses,
+            "hit_rate":hits/lookups if lookups else 0.0
+        }
+
+
+class StoredImageEncoder:
+    '''
+    Serves page embeddings from an EmbeddingStore and only runs Colpali on pages
+    it has not seen before for the current model revision
+    '''
+    def __init__(self,encoder,store:EmbeddingStore,model_key:str):
+        self.encoder=encoder
+        self.store=store
+        self.model_key=model_key
+        #Per thread, several ingestions can share the encoder
+        self._last=threading.local()
+
+    def last_reused(self)->int:
+        '''
+        How many pages of this thread's last get_image_embeddings call came from the store
+        '''
+        return getattr(self._last,"reused",0)
+
+    def get_image_embeddings(self,images:List)->List[np.ndarray]:
+        keys=[page_hash(image,self.model_key) for image in images]
+        embeddings=[self.store.get(key) for key in keys]
+        missing=[i for i,embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed=self.encoder.get_image_embeddings([images[i] for i in missing])
+            for i,embedding in zip(missing,computed):
+                self.store.put(keys[i],embedding)
+                embeddings[i]=embedding
+        self._last.reused=len(images)-len(missing)
+        if len(missing)<len(images):
+            print(f"[INFO] Reused {len(images)-len(missing)}/{len(images)} page embeddings from store")
+        return embeddings
+
+
+def main():
+    parser=argparse.ArgumentParser(description="Inspect or trim the page embedding store")
+    parser.add_argument("command",choices=["stats","evict"])
+    parser.add_argument("--root",default=os.getenv("EMBEDDING_STORE_DIR","./model_cache/page_embeddings"))
+    parser.add_argument("--max-gb",type=float,default=float(os.getenv("EMBEDDING_STORE_MAX_GB","5")))
+    args=parser.parse_args()
+
+    store=EmbeddingStore(args.root,int(args.max_gb*1024**3))
+    if args.command=="evict":
+        store.evict()
+    stats=store.stats()
+    print(f"Store:        {stats['root']}")
+    print(f"Entries:      {stats['entries']}")
+    print(f"Size:         {stats['bytes']/1024**2:.1f} MB / {stats['max_bytes']/1024**2:.1f} MB")
+    if stats["oldest_use"]:
+        print(f"Oldest use:   {time.strftime('%Y-%m-%d %H:%M:%S',time.localtime(stats['oldest_use']))}")
+
+
+if __name__=="__main__":
+    main()
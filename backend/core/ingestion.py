@@ -0,0 +1,217 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor,wait as wait_futures
+from typing import Iterable,List,Dict
+from .metrics import Histogram
+
+_DONE=object()
+PAGE_ENCODE_MS_BUCKETS=[5,10,25,50,100,250,500,1000,2500]
+PAGE_IMAGE_KB_BUCKETS=[32,64,128,256,512,1024,2048,4096]
+
+
+class IngestionPipeline:
+    '''
+    Streams pages into Qdrant through three concurrent stages connected by bounded queues:
+
+        rasterization -> embedding -> upserting
+
+    The producer pulls page records from the page iterable (rasterizing lazily when it is a
+    generator), the embedder skips unchanged pages and embeds the rest, and the upserter sends
+    batches with wait=False, upsert_concurrency at a time (on threads, or through rag.aupsert on
+    the shared async client when it is enabled). The last batch is held back and
+    sent with wait=True once all others are acknowledged; Qdrant applies updates in order, so
+    this is the single durability barrier. Memory is bounded by the queue sizes, not page count.
+    A page's points are only queued for upserting once its image is on disk, so every search hit
+    can be displayed; pages whose image failed to save are left out of the index.
+    '''
+    def __init__(self,rag,queue_size:int=16,upsert_concurrency:int=4,upsert_batch_size:int=8):
+        self.rag=rag
+        self.queue_size=max(1,queue_size)
+        self.upsert_concurrency=max(1,upsert_concurrency)
+        self.upsert_batch_size=max(1,upsert_batch_size)
+
+    @staticmethod
+    def _put(target:queue.Queue,item,stop:threading.Event)->bool:
+        #Bounded put that gives up when another stage has failed
+        while not stop.is_set():
+            try:
+                target.put(item,timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _get(source:queue.Queue,stop:threading.Event):
+        while not stop.is_set():
+            try:
+                return source.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _produce(self,pages:Iterable[Dict],page_queue:queue.Queue,stop:threading.Event,errors:List)->None:
+        try:
+            for page in pages:
+                if not self._put(page_queue,page,stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            self._put(page_queue,_DONE,stop)
+
+    @staticmethod
+    def _await_writes(batch:List[Dict],stats:Dict)->List[Dict]:
+        '''
+        Wait for the page images of a batch to be saved and return the pages that failed
+        '''
+        failed=[]
+        for page in batch:
+            saved=page.get("saved")
+            if saved is None:
+                continue
+            try:
+                result=saved.result()
+            except Exception as e:
+                print(f"[ERROR] Failed to save page {page['page_number']} of document {page['doc_id']}: {e}")
+                failed.append(page)
+                continue
+            stats["page_encode_ms"].observe(result["encode_ms"])
+            stats["page_image_kb"].observe(result["bytes"]/1024)
+            stats["image_bytes"]+=result["bytes"]
+        return failed
+
+    def _embed(self,page_queue:queue.Queue,point_queue:queue.Queue,stop:threading.Event,errors:List,stats:Dict)->None:
+        rag=self.rag
+        prefetch_pooling=rag.prefetch_pooling if rag.qdrant.uses_named_vectors(rag.collection) else None
+        try:
+            finished=False
+            while not finished:
+                first=self._get(page_queue,stop)
+                if first is _DONE:
+                    break
+                #Take whatever else is already rasterized, up to the current batch size
+                batch=[first]
+                target=rag.batch_sizer.next_size([first["image"]])
+                while len(batch)<target:
+                    try:
+                        page=page_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if page is _DONE:
+                        finished=True
+                        break
+                    batch.append(page)
+
+                for page in batch:
+                    #The converter's page count, so pages of a window that failed to convert are not taken as removed
+                    page_count=page.get("page_count") or max(stats["page_counts"].get(page["doc_id"],0),page["page_number"])
+                    stats["page_counts"][page["doc_id"]]=page_count
+                stats["pages"]+=len(batch)
+                changed=rag._changed_pages(batch)
+                stats["embedded"]+=len(changed)
+                points=[]
+                if changed:
+                    points=rag.qdrant.create_points(
+                        rag.image_encoder,
+                        changed,
+                        pooler=rag.pooler,
+                        batch_sizer=rag.batch_sizer,
+                        prefetch_pooling=prefetch_pooling,
+                        revision=rag.index_revision
+                    )
+                #Images were encoding while the batch was embedded; a page is retrievable only once saved
+                failed=self._await_writes(batch,stats)
+                if failed:
+                    failed_ids={rag.qdrant.point_id(page["doc_id"],page["page_number"],rag.index_revision) for page in failed}
+                    points=[point for point in points if point["id"] not in failed_ids]
+                for i in range(0,len(points),self.upsert_batch_size):
+                    if not self._put(point_queue,points[i:i+self.upsert_batch_size],stop):
+                        return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            self._put(point_queue,_DONE,stop)
+
+    def _upsert(self,point_queue:queue.Queue,stop:threading.Event,errors:List,stats:Dict)->None:
+        rag=self.rag
+        slots=threading.BoundedSemaphore(self.upsert_concurrency)
+        #With the async client batches go through rag.aupsert on its loop instead of a thread each
+        executor=None if rag.async_qdrant is not None else ThreadPoolExecutor(max_workers=self.upsert_concurrency,thread_name_prefix="qdrant-upsert")
+
+        def send(points):
+            try:
+                rag.qdrant.upsert_batch(points,rag.collection,wait=False)
+            finally:
+                slots.release()
+
+        def submit(points):
+            if executor is not None:
+                return executor.submit(send,points)
+            future=rag.async_qdrant.submit(rag.aupsert(points,wait=False))
+            future.add_done_callback(lambda _:slots.release())
+            return future
+
+        futures=[]
+        held=None
+        try:
+            while True:
+                points=self._get(point_queue,stop)
+                if points is _DONE:
+                    break
+                if held is not None:
+                    slots.acquire()
+                    futures.append(submit(held))
+                held=points
+                stats["upserted"]+=len(points)
+            wait_futures(futures)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        for future in futures:
+            if future.exception():
+                raise future.exception()
+        if held is not None and not stop.is_set():
+            #Durability barrier: completes only after every earlier update has been applied
+            if executor is None:
+                rag.async_qdrant.submit(rag.aupsert(held,wait=True)).result()
+            else:
+                rag.qdrant.upsert_batch(held,rag.collection,wait=True)
+
+    def run(self,pages:Iterable[Dict])->Dict:
+        '''
+        Ingest all pages and return counts of pages seen, embedded and upserted
+        '''
+        page_queue=queue.Queue(maxsize=self.queue_size)
+        point_queue=queue.Queue(maxsize=max(1,self.queue_size//self.upsert_batch_size)+self.upsert_concurrency)
+        stop=threading.Event()
+        errors=[]
+        stats={"pages":0,"embedded":0,"upserted":0,"page_counts":{},"image_bytes":0,
+               "page_encode_ms":Histogram("page_encode_ms",PAGE_ENCODE_MS_BUCKETS),
+               "page_image_kb":Histogram("page_image_kb",PAGE_IMAGE_KB_BUCKETS)}
+        started=time.perf_counter()
+
+        producer=threading.Thread(target=self._produce,args=(pages,page_queue,stop,errors),name="ingest-rasterize",daemon=True)
+        embedder=threading.Thread(target=self._embed,args=(page_queue,point_queue,stop,errors,stats),name="ingest-embed",daemon=True)
+        producer.start()
+        embedder.start()
+        try:
+            self._upsert(point_queue,stop,errors,stats)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        embedder.join()
+        producer.join()
+        if errors:
+            raise errors[0]
+
+        stats["seconds"]=time.perf_counter()-started
+        stats["page_encode_ms"]=stats["page_encode_ms"].snapshot()
+        stats["page_image_kb"]=stats["page_image_kb"].snapshot()
+        print(f"[INFO] Ingested {stats['pages']} pages ({stats['embedded']} embedded, {stats['upserted']} upserted) "
+              f"in {stats['seconds']:.1f}s, page images {stats['image_bytes']/1024**2:.1f} MB "
+              f"(encode p50 {stats['page_encode_ms']['p50']:g} ms)")
+        return stats
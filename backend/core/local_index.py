@@ -0,0 +1,439 @@
+import json
+import os
+import shutil
+import threading
+from types import SimpleNamespace
+from typing import List,Dict,Optional
+import numpy as np
+from qdrant_client.http import models
+from .qdrant_client import VectorDBClient
+from .pooling import prefetch_vectors
+
+#Payload fields kept in in-memory lookup tables, the local counterpart of Qdrant payload indexes
+INDEXED_FIELDS=("owner_id","doc_id")
+#Upper bound on page vectors decoded from the memory map at once while scoring
+SCORE_CHUNK_TOKENS=1<<18
+
+
+def _normalize(vectors:np.ndarray)->np.ndarray:
+    vectors=np.asarray(vectors,dtype=np.float32)
+    return vectors/np.linalg.norm(vectors,axis=1,keepdims=True).clip(min=1e-12)
+
+
+def _json_default(value):
+    if isinstance(value,np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def maxsim_scores(queries:List[np.ndarray],vectors:np.ndarray,offsets:np.ndarray,counts:np.ndarray,
+                  chunk_tokens:int=SCORE_CHUNK_TOKENS)->np.ndarray:
+    '''
+    MaxSim score of every query against every page, shape (queries, pages).
+    Page i owns vectors[offsets[i]:offsets[i]+counts[i]]. Pages are scored in chunks: the
+    chunk's vectors are decoded once, multiplied with each query in one matmul, max-reduced
+    per page with reduceat and summed over query tokens.
+    '''
+    scores=np.zeros((len(queries),len(offsets)),dtype=np.float32)
+    ends=np.cumsum(counts)
+    start=0
+    while start<len(offsets):
+        #Pages whose vectors fit in the chunk budget, at least one
+        stop=max(start+1,int(np.searchsorted(ends,ends[start]-counts[start]+chunk_tokens,side="right")))
+        chunk_offsets=offsets[start:stop]
+        chunk_counts=counts[start:stop]
+        first=chunk_offsets[0]
+        if np.array_equal(chunk_offsets-first,np.concatenate(([0],np.cumsum(chunk_counts)[:-1]))):
+            block=vectors[first:first+chunk_counts.sum()]
+        else:
+            block=np.concatenate([vectors[offset:offset+count] for offset,count in zip(chunk_offsets,chunk_counts)])
+        block=np.asarray(block,dtype=np.float32)
+        starts=np.concatenate(([0],np.cumsum(chunk_counts)[:-1]))
+        for i,query in enumerate(queries):
+            similarities=query@block.T
+            scores[i,start:stop]=np.maximum.reduceat(similarities,starts,axis=1).sum(axis=0)
+        start=stop
+    return scores
+
+
+class _VectorFile:
+    '''
+    Append-only float16 matrix on disk, read through a memory map
+    '''
+    def __init__(self,path:str,dim:int):
+        self.path=path
+        self.dim=dim
+        self.rows=os.path.getsize(path)//(dim*2) if os.path.exists(path) else 0
+        self._map=None
+
+    def append(self,vectors:np.ndarray)->int:
+        offset=self.rows
+        with open(self.path,"ab") as f:
+            f.write(np.ascontiguousarray(vectors,dtype=np.float16).tobytes())
+        self.rows+=len(vectors)
+        return offset
+
+    def truncate(self,rows:int)->None:
+        if rows<self.rows:
+            with open(self.path,"r+b") as f:
+                f.truncate(rows*self.dim*2)
+            self.rows=rows
+            self._map=None
+
+    def view(self)->np.ndarray:
+        if self.rows==0:
+            return np.zeros((0,self.dim),dtype=np.float16)
+        if self._map is None or len(self._map)!=self.rows:
+            self._map=np.memmap(self.path,dtype=np.float16,mode="r",shape=(self.rows,self.dim))
+        return self._map
+
+
+class _LocalCollection:
+    '''
+    One collection on disk:
+        config.json     vector size and whether pages have prefetch vectors
+        original.f16    normalized page multivectors, one row per vector
+        prefetch.f16    pooled prefetch multivectors (two-stage collections)
+        points.jsonl    append-only log of upserts and deletes with payloads and row offsets
+    '''
+    def __init__(self,root:str,vector_size:int=None,two_stage:bool=True):
+        self.root=root
+        config_path=os.path.join(root,"config.json")
+        if vector_size is not None:
+            os.makedirs(root,exist_ok=True)
+            with open(config_path,"w") as f:
+                json.dump({"vector_size":vector_size,"two_stage":two_stage},f)
+        with open(config_path) as f:
+            config=json.load(f)
+        self.vector_size=config["vector_size"]
+        self.two_stage=config["two_stage"]
+        self.lock=threading.RLock()
+        self._load()
+
+    def _load(self)->None:
+        self.original=_VectorFile(os.path.join(self.root,"original.f16"),self.vector_size)
+        self.prefetch=_VectorFile(os.path.join(self.root,"prefetch.f16"),self.vector_size) if self.two_stage else None
+        self.log_path=os.path.join(self.root,"points.jsonl")
+        self.points={}
+        if os.path.exists(self.log_path):
+            with open(self.log_path) as f:
+                for line in f:
+                    try:
+                        record=json.loads(line)
+                    except ValueError:
+                        #Torn last line from an interrupted write
+                        break
+                    if record["op"]=="upsert":
+                        self.points[self._key(record["id"])]=record
+                    else:
+                        for point_id in record["ids"]:
+                            self.points.pop(self._key(point_id),None)
+        #Drop vectors appended after the last logged upsert
+        records=list(self.points.values())
+        self.original.truncate(max((r["offset"]+r["tokens"] for r in records),default=0))
+        if self.prefetch is not None:
+            self.prefetch.truncate(max((r["prefetch_offset"]+r["prefetch_tokens"] for r in records),default=0))
+        self._dirty=True
+
+    @staticmethod
+    def _key(point_id)->str:
+        return str(point_id)
+
+    def ensure_index(self)->None:
+        '''
+        Refresh the row arrays and payload lookup tables used by search after writes
+        '''
+        if not self._dirty:
+            return
+        records=list(self.points.values())
+        self.records=records
+        self.offsets=np.array([r["offset"] for r in records],dtype=np.int64)
+        self.counts=np.array([r["tokens"] for r in records],dtype=np.int64)
+        if self.two_stage:
+            self.prefetch_offsets=np.array([r["prefetch_offset"] for r in records],dtype=np.int64)
+            self.prefetch_counts=np.array([r["prefetch_tokens"] for r in records],dtype=np.int64)
+        self.lookup={field:{} for field in INDEXED_FIELDS}
+        for row,record in enumerate(records):
+            for field in INDEXED_FIELDS:
+                value=record["payload"].get(field)
+                if value is not None:
+                    self.lookup[field].setdefault(value,[]).append(row)
+        self._dirty=False
+
+    def _append_log(self,records:List[Dict])->None:
+        with open(self.log_path,"a") as f:
+            for record in records:
+                f.write(json.dumps(record,default=_json_default)+"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def upsert(self,points:List[Dict])->None:
+        with self.lock:
+            records=[]
+            for point in points:
+                vectors=_normalize(point["vector"])
+                record={"op":"upsert","id":point["id"],"offset":self.original.append(vectors),
+                        "tokens":len(vectors),"payload":point.get("payload") or {}}
+                if self.two_stage:
+                    prefetch=point.get("prefetch_vector")
+                    prefetch=_normalize(prefetch_vectors(point["vector"]) if prefetch is None else prefetch)
+                    record["prefetch_offset"]=self.prefetch.append(prefetch)
+                    record["prefetch_tokens"]=len(prefetch)
+                records.append(record)
+            #Vectors are written before the log, so a logged point always has its vectors
+            self._append_log(records)
+            for record in records:
+                self.points[self._key(record["id"])]=record
+            self._dirty=True
+
+    def delete(self,point_ids:List)->int:
+        with self.lock:
+            point_ids=[point_id for point_id in point_ids if self._key(point_id) in self.points]
+            if not point_ids:
+                return 0
+            self._append_log([{"op":"delete","ids":point_ids}])
+            for point_id in point_ids:
+                self.points.pop(self._key(point_id))
+            self._dirty=True
+            live=sum(record["tokens"] for record in self.points.values())
+            if self.original.rows>2*live+SCORE_CHUNK_TOKENS:
+                self.compact()
+            return len(point_ids)
+
+    def set_payload(self,point_ids:List,values:Dict)->None:
+        '''
+        Merge values into the payload of existing points; the vectors stay where they are
+        '''
+        with self.lock:
+            records=[dict(self.points[self._key(point_id)],payload={**self.points[self._key(point_id)]["payload"],**values})
+                     for point_id in point_ids if self._key(point_id) in self.points]
+            if not records:
+                return
+            self._append_log(records)
+            for record in records:
+                self.points[self._key(record["id"])]=record
+            self._dirty=True
+
+    def compact(self)->None:
+        '''
+        Rewrite the files with live points only, reclaiming space held by deleted or replaced pages
+        '''
+        with self.lock:
+            tmp_root=f"{self.root}.compact"
+            shutil.rmtree(tmp_root,ignore_errors=True)
+            compacted=_LocalCollection(tmp_root,self.vector_size,self.two_stage)
+            original=self.original.view()
+            prefetch=self.prefetch.view() if self.two_stage else None
+            records=[]
+            for record in self.points.values():
+                record=dict(record,offset=compacted.original.append(original[record["offset"]:record["offset"]+record["tokens"]]))
+                if self.two_stage:
+                    start=record["prefetch_offset"]
+                    record["prefetch_offset"]=compacted.prefetch.append(prefetch[start:start+record["prefetch_tokens"]])
+                records.append(record)
+            compacted._append_log(records)
+            #Release the memory maps so the directories can be swapped on every platform
+            del original,prefetch
+            self.original._map=None
+            if self.two_stage:
+                self.prefetch._map=None
+            old_root=f"{self.root}.old"
+            os.replace(self.root,old_root)
+            os.replace(tmp_root,self.root)
+            shutil.rmtree(old_root,ignore_errors=True)
+            self._load()
+            print(f"[INFO] Compacted local collection {self.root} to {len(self.points)} points")
+
+    def rows_matching(self,conditions:Dict[str,set])->np.ndarray:
+        '''
+        Rows whose payload value for each field is one of the allowed values
+        '''
+        self.ensure_index()
+        rows=None
+        for field,allowed in conditions.items():
+            if field in self.lookup:
+                matched=set(row for value in allowed for row in self.lookup[field].get(value,[]))
+            else:
+                matched=set(row for row,record in enumerate(self.records) if record["payload"].get(field) in allowed)
+            rows=matched if rows is None else rows&matched
+        if rows is None:
+            return np.arange(len(self.records))
+        return np.array(sorted(rows),dtype=np.int64)
+
+
+class LocalVectorDBClient(VectorDBClient):
+    '''
+    Embedded late-interaction engine with the VectorDBClient interface, for single-node and test
+    deployments that do not want to run Qdrant. Each collection is a directory holding normalized
+    page multivectors as memory-mapped float16 matrices and an append-only payload log, so it
+    persists across restarts. Search is exact MaxSim over the pages matching the payload filter,
+    optionally shortlisted by MaxSim over the pooled prefetch vectors first. Quantization options
+    are accepted and ignored.
+    '''
+    def __init__(self,root:str):
+        self.root=root
+        self._named_vectors={}
+        self._collections={}
+        self._lock=threading.Lock()
+        os.makedirs(root,exist_ok=True)
+
+    def _get_client_info(self):
+        return SimpleNamespace(title="local",version="numpy",root=self.root)
+
+    def _get_collections(self):
+        names=sorted(name for name in os.listdir(self.root) if os.path.exists(os.path.join(self.root,name,"config.json")))
+        return SimpleNamespace(collections=[SimpleNamespace(name=name) for name in names])
+
+    def _collection(self,name:str)->_LocalCollection:
+        with self._lock:
+            if name not in self._collections:
+                path=os.path.join(self.root,name)
+                if not os.path.exists(os.path.join(path,"config.json")):
+                    raise ValueError(f"Collection '{name}' not found in {self.root}")
+                self._collections[name]=_LocalCollection(path)
+            return self._collections[name]
+
+    def create_collection(self,name:str='test',vector_size:int=128,two_stage:bool=True,
+                          quantization:str=None)->None:
+        '''
+        Create an empty collection, replacing any existing one with the same name
+        '''
+        with self._lock:
+            path=os.path.join(self.root,name)
+            shutil.rmtree(path,ignore_errors=True)
+            self._collections[name]=_LocalCollection(path,vector_size,two_stage)
+
+    def delete_collection(self,name:str)->None:
+        with self._lock:
+            self._collections.pop(name,None)
+            shutil.rmtree(os.path.join(self.root,name),ignore_errors=True)
+
+    def create_payload_indexes(self,name:str='test')->None:
+        #owner_id and doc_id lookups are always kept in memory
+        return None
+
+    def enable_quantization(self,name:str,quantization:str)->bool:
+        return False
+
+    def uses_named_vectors(self,collection_name:str)->bool:
+        return self._collection(collection_name).two_stage
+
+    def get_fingerprints(self,point_ids:List[str],collection_name:str='test',chunk_size:int=256)->Dict[str,str]:
+        collection=self._collection(collection_name)
+        fingerprints={}
+        for point_id in point_ids:
+            record=collection.points.get(collection._key(point_id))
+            if record is not None:
+                fingerprints[str(point_id)]=record["payload"].get("fingerprint")
+        return fingerprints
+
+    def delete_stale_pages(self,doc_id,page_count:int,revision:str,collection_name:str='test')->None:
+        collection=self._collection(collection_name)
+        rows=collection.rows_matching({"doc_id":{doc_id}})
+        stale=[collection.records[row]["id"] for row in rows
+               if collection.records[row]["payload"].get("page_num",0)>page_count
+               or collection.records[row]["payload"].get("revision")!=revision]
+        collection.delete(stale)
+
+    def delete_documents(self,doc_ids:List[int],collection_name:str='test')->None:
+        if not doc_ids:
+            return
+        collection=self._collection(collection_name)
+        rows=collection.rows_matching({"doc_id":set(doc_ids)})
+        collection.delete([collection.records[row]["id"] for row in rows])
+
+    def indexed_document_ids(self,collection_name:str='test',page_size:int=1024)->set:
+        collection=self._collection(collection_name)
+        collection.ensure_index()
+        return set(collection.lookup["doc_id"])
+
+    def unowned_document_ids(self,collection_name:str='test',page_size:int=1024)->set:
+        collection=self._collection(collection_name)
+        collection.ensure_index()
+        doc_ids={record["payload"].get("doc_id") for record in collection.records if record["payload"].get("owner_id") is None}
+        doc_ids.discard(None)
+        return doc_ids
+
+    def set_document_owner(self,doc_id:int,owner_id,collection_name:str='test')->None:
+        collection=self._collection(collection_name)
+        rows=collection.rows_matching({"doc_id":{doc_id}})
+        collection.set_payload([collection.records[row]["id"] for row in rows],{"owner_id":str(owner_id)})
+
+    def upsert_batch(self,points:List[Dict],collection_name:str='test',wait:bool=True)->None:
+        '''
+        Append points to the collection; writes are durable when this returns, whatever wait is
+        '''
+        self._collection(collection_name).upsert(points)
+
+    @staticmethod
+    def _select_payload(payload:Dict,with_payload)->Optional[Dict]:
+        if with_payload is True:
+            return dict(payload)
+        if not with_payload:
+            return None
+        return {field:payload[field] for field in with_payload if field in payload}
+
+    def _search(self,collection:_LocalCollection,queries:List[np.ndarray],rows:np.ndarray,
+                prefetch_limit:int,limit:int,score_threshold:float,with_payload)->List:
+        #Each query is scored against the same candidate rows; the shortlist is per query
+        records,offsets,counts=collection.records,collection.offsets,collection.counts
+        original=collection.original.view()
+        if collection.two_stage and prefetch_limit and len(rows)>max(prefetch_limit,limit):
+            shortlist_scores=maxsim_scores(queries,collection.prefetch.view(),
+                                           collection.prefetch_offsets[rows],collection.prefetch_counts[rows])
+            depth=max(prefetch_limit,limit)
+            candidates=[rows[np.argpartition(-row_scores,depth-1)[:depth]] for row_scores in shortlist_scores]
+            scores=[maxsim_scores([query],original,offsets[cand],counts[cand])[0] for query,cand in zip(queries,candidates)]
+        else:
+            candidates=[rows]*len(queries)
+            scores=list(maxsim_scores(queries,original,offsets[rows],counts[rows]))
+
+        responses=[]
+        for cand,cand_scores in zip(candidates,scores):
+            order=np.argsort(-cand_scores,kind="stable")[:limit]
+            points=[]
+            for i in order:
+                score=float(cand_scores[i])
+                if score_threshold is not None and score<score_threshold:
+                    break
+                record=records[cand[i]]
+                points.append(models.ScoredPoint(
+                    id=record["id"],
+                    version=0,
+                    score=score,
+                    payload=self._select_payload(record["payload"],with_payload)
+                ))
+            responses.append(models.QueryResponse(points=points))
+        return responses
+
+    def _candidate_rows(self,collection:_LocalCollection,owner_id,document_ids)->np.ndarray:
+        conditions={}
+        if owner_id is not None:
+            conditions["owner_id"]={str(owner_id)}
+        if document_ids:
+            conditions["doc_id"]={int(i) for i in document_ids}
+        return collection.rows_matching(conditions)
+
+    def search(self,user_query:np.ndarray,collection_name:str='test',prefetch_limit:int=None,
+               use_quantization:bool=True,oversampling:float=2.0,rescore:bool=True,
+               owner_id=None,document_ids:List[int]=None,limit:int=5,score_threshold:float=None,
+               with_payload=True,with_vectors:bool=False):
+        '''
+        Exact MaxSim search over the pages matching owner_id and document_ids.
+        Returns a QueryResponse like the Qdrant client; vectors are never returned.
+        '''
+        return self.search_batch([user_query],collection_name,prefetch_limit=prefetch_limit,owner_id=owner_id,
+                                 document_ids=document_ids,limit=limit,score_threshold=score_threshold,
+                                 with_payload=with_payload)[0]
+
+    def search_batch(self,user_queries:List[np.ndarray],collection_name:str='test',prefetch_limit:int=None,
+                     owner_id=None,document_ids:List[int]=None,limit:int=5,score_threshold:float=None,
+                     with_payload=True,**options)->List:
+        '''
+        Several searches sharing one pass over the candidate pages, one QueryResponse per query
+        '''
+        collection=self._collection(collection_name)
+        with collection.lock:
+            rows=self._candidate_rows(collection,owner_id,document_ids)
+            queries=[_normalize(query) for query in user_queries]
+            return self._search(collection,queries,rows,prefetch_limit,limit,score_threshold,with_payload)
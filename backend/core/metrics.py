@@ -0,0 +1,62 @@
+import threading
+from bisect import bisect_left
+from typing import List,Dict
+
+
+class Histogram:
+    '''
+    Thread-safe fixed-bucket histogram used for latency and size metrics
+    '''
+    def __init__(self,name:str,buckets:List[float]):
+        self.name=name
+        self.buckets=sorted(buckets)
+        self._counts=[0]*(len(self.buckets)+1)
+        self._sum=0.0
+        self._count=0
+        self._lock=threading.Lock()
+
+    def observe(self,value:float)->None:
+        '''
+        Record a single observation
+        '''
+        index=bisect_left(self.buckets,value)
+        with self._lock:
+            self._counts[index]+=1
+            self._sum+=value
+            self._count+=1
+
+    def quantile(self,q:float)->float:
+        '''
+        Approximate quantile, reported as the upper bound of the bucket containing it
+        '''
+        with self._lock:
+            counts=list(self._counts)
+            total=self._count
+        if total==0:
+            return 0.0
+        target=q*total
+        seen=0
+        for index,count in enumerate(counts):
+            seen+=count
+            if seen>=target:
+                return self.buckets[index] if index<len(self.buckets) else float('inf')
+        return float('inf')
+
+    def snapshot(self)->Dict:
+        '''
+        Return the current bucket counts and summary statistics
+        '''
+        with self._lock:
+            counts=list(self._counts)
+            total=self._count
+            value_sum=self._sum
+        labels=[f"<={bound:g}" for bound in self.buckets]+["+inf"]
+        return {
+            "name":self.name,
+            "count":total,
+            "sum":value_sum,
+            "mean":value_sum/total if total else 0.0,
+            "p50":self.quantile(0.5),
+            "p99":self.quantile(0.99),
+            "buckets":dict(zip(labels,counts))
+        }
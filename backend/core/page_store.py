@@ -0,0 +1,314 @@
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict,List,Optional
+try:
+    import fcntl
+except ImportError:
+    #Windows: writers are only serialized within one process
+    fcntl=None
+
+#File layout: header | offset table (capacity entries, one per page number) | page blobs
+#header: magic, version, flags, capacity, garbage bytes
+HEADER=struct.Struct("<4sHHIQ")
+HEADER_SIZE=32
+FLAGS_OFFSET=6
+#entry: blob offset, blob length (0 = no page), codec
+ENTRY=struct.Struct("<QIB3x")
+MAGIC=b"PGPK"
+VERSION=1
+#Set on a file that has been replaced or deleted, so readers holding a map of it reopen
+FLAG_SUPERSEDED=1
+CODECS={"png":1,"jpeg":2,"webp":3}
+CODEC_NAMES={code:name for name,code in CODECS.items()}
+INITIAL_CAPACITY=64
+#Rewrite a file once overwritten pages take more space than this and than its live pages
+COMPACT_MIN_GARBAGE=4*1024*1024
+#Writes from every store in the process are serialized, and across processes by an advisory lock on this file
+_write_lock=threading.Lock()
+LOCK_FILE=".write.lock"
+#Stores returned by PageStore.shared(), by absolute root
+_shared={}
+_shared_lock=threading.Lock()
+
+
+class PageStore:
+    '''
+    Packed page images, one file per document keyed by the database document id.
+
+    Each <doc_id>.pages file starts with an offset table indexed by page number, so a
+    lookup is one slice of a memory-mapped file instead of an open() of a reconstructed
+    filename. Pages are appended and the table entry is written after the blob, so a
+    page is either complete or absent. Overwritten pages leave garbage that is compacted
+    away once it outweighs the live pages; the offset table doubles when a page number
+    exceeds it. Both rewrite the file and flag the old one so other readers remap.
+    Writes hold a process-wide lock and, where fcntl exists, an advisory lock on a file
+    in root, so server workers sharing the folder never interleave rewrites of one file.
+    Up to max_open documents stay mapped between lookups; a map is closed before its
+    file is replaced or removed, which an open map would block on Windows. Components
+    of one process should use PageStore.shared() so no other store holds a map of it.
+    '''
+    def __init__(self,root:str,max_open:int=64):
+        self.root=root
+        os.makedirs(root,exist_ok=True)
+        self.max_open=max(1,max_open)
+        self._maps=OrderedDict()
+        self._read_lock=threading.Lock()
+
+    @classmethod
+    def shared(cls,root:str)->"PageStore":
+        '''
+        The process-wide store for a root folder, created on first use
+        '''
+        key=os.path.abspath(root)
+        with _shared_lock:
+            if key not in _shared:
+                _shared[key]=cls(root)
+            return _shared[key]
+
+    @contextmanager
+    def _locked(self):
+        with _write_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.root,LOCK_FILE),"a") as lock_file:
+                fcntl.flock(lock_file,fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file,fcntl.LOCK_UN)
+
+    def _path(self,doc_id:int)->str:
+        return os.path.join(self.root,f"{int(doc_id)}.pages")
+
+    @staticmethod
+    def _create(path:str,capacity:int)->None:
+        with open(path,"wb") as f:
+            f.write(HEADER.pack(MAGIC,VERSION,0,capacity,0).ljust(HEADER_SIZE,b"\0"))
+            f.write(b"\0"*(capacity*ENTRY.size))
+
+    @staticmethod
+    def _read_header(f)->tuple:
+        f.seek(0)
+        magic,version,flags,capacity,garbage=HEADER.unpack(f.read(HEADER.size))
+        if magic!=MAGIC or version!=VERSION:
+            raise ValueError(f"[ERROR] Not a page store file: {f.name}")
+        return flags,capacity,garbage
+
+    @staticmethod
+    def _entries(f,capacity:int)->List[tuple]:
+        f.seek(HEADER_SIZE)
+        table=f.read(capacity*ENTRY.size)
+        return [ENTRY.unpack_from(table,i*ENTRY.size) for i in range(capacity)]
+
+    @staticmethod
+    def _supersede(f)->None:
+        f.seek(FLAGS_OFFSET)
+        f.write(struct.pack("<H",FLAG_SUPERSEDED))
+        f.flush()
+
+    def _rewrite(self,path:str,f,capacity:int)->str:
+        '''
+        Copy the live pages of an open store file into a new file with the given table capacity and return its path
+        '''
+        _,old_capacity,_=self._read_header(f)
+        entries=self._entries(f,old_capacity)
+        temp_path=f"{path}.tmp"
+        self._create(temp_path,capacity)
+        with open(temp_path,"r+b") as out:
+            out.seek(0,2)
+            table=[]
+            for offset,length,codec in entries:
+                if length:
+                    f.seek(offset)
+                    table.append((out.tell(),length,codec))
+                    out.write(f.read(length))
+                else:
+                    table.append((0,0,0))
+            out.seek(HEADER_SIZE)
+            out.write(b"".join(ENTRY.pack(*entry) for entry in table))
+        return temp_path
+
+    def _retire(self,doc_id:int,path:str,temp_path:Optional[str]=None)->None:
+        '''
+        Replace a closed store file with temp_path, or remove it when temp_path is None
+        '''
+        #Readers of this store wait, so they never map the flagged file before it is swapped
+        with self._read_lock:
+            mapped=self._maps.pop(int(doc_id),None)
+            if mapped is not None:
+                mapped.close()
+            #Flagged before the swap, the old file cannot be opened by path afterwards on Windows
+            with open(path,"r+b") as f:
+                self._supersede(f)
+            if temp_path is None:
+                os.remove(path)
+            else:
+                os.replace(temp_path,path)
+
+    def put(self,doc_id:int,page_number:int,data:bytes,codec:str="png")->None:
+        '''
+        Store the encoded image of a page, replacing any earlier version
+        '''
+        path=self._path(doc_id)
+        with self._locked():
+            if not os.path.exists(path):
+                self._create(path,max(INITIAL_CAPACITY,page_number))
+            temp_path=None
+            with open(path,"r+b") as f:
+                _,capacity,garbage=self._read_header(f)
+                if page_number>capacity:
+                    new_capacity=capacity
+                    while new_capacity<page_number:
+                        new_capacity*=2
+                    temp_path=self._rewrite(path,f,new_capacity)
+            if temp_path is not None:
+                self._retire(doc_id,path,temp_path)
+                temp_path=None
+            with open(path,"r+b") as f:
+                flags,capacity,garbage=self._read_header(f)
+                entry_pos=HEADER_SIZE+(page_number-1)*ENTRY.size
+                f.seek(entry_pos)
+                _,old_length,_=ENTRY.unpack(f.read(ENTRY.size))
+                f.seek(0,2)
+                offset=f.tell()
+                f.write(data)
+                f.flush()
+                #The entry is written last, readers never see a partial page
+                f.seek(entry_pos)
+                f.write(ENTRY.pack(offset,len(data),CODECS[codec]))
+                garbage+=old_length
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC,VERSION,flags,capacity,garbage))
+                f.flush()
+                live=offset+len(data)-HEADER_SIZE-capacity*ENTRY.size-garbage
+                if garbage>COMPACT_MIN_GARBAGE and garbage>live:
+                    temp_path=self._rewrite(path,f,capacity)
+            if temp_path is not None:
+                self._retire(doc_id,path,temp_path)
+
+    def retain(self,doc_id:int,page_count:int)->int:
+        '''
+        Drop pages numbered above page_count, e.g. after a shorter revision; returns how many were dropped
+        '''
+        path=self._path(doc_id)
+        with self._locked():
+            if not os.path.exists(path):
+                return 0
+            with open(path,"r+b") as f:
+                flags,capacity,garbage=self._read_header(f)
+                dropped=0
+                for index,(_,length,_) in enumerate(self._entries(f,capacity)):
+                    if length and index>=page_count:
+                        f.seek(HEADER_SIZE+index*ENTRY.size)
+                        f.write(ENTRY.pack(0,0,0))
+                        garbage+=length
+                        dropped+=1
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC,VERSION,flags,capacity,garbage))
+        return dropped
+
+    def delete(self,doc_id:int)->int:
+        '''
+        Remove all pages of a document and return how many there were
+        '''
+        path=self._path(doc_id)
+        with self._locked():
+            if not os.path.exists(path):
+                return 0
+            with open(path,"rb") as f:
+                _,capacity,_=self._read_header(f)
+                count=sum(1 for _,length,_ in self._entries(f,capacity) if length)
+            self._retire(doc_id,path)
+        return count
+
+    def document_ids(self)->List[int]:
+        '''
+        Ids of all documents with a page file
+        '''
+        return sorted(int(name[:-len(".pages")]) for name in os.listdir(self.root)
+                      if name.endswith(".pages") and name[:-len(".pages")].isdigit())
+
+    def pages(self,doc_id:int)->List[int]:
+        '''
+        Page numbers stored for a document
+        '''
+        path=self._path(doc_id)
+        if not os.path.exists(path):
+            return []
+        with open(path,"rb") as f:
+            _,capacity,_=self._read_header(f)
+            return [index+1 for index,(_,length,_) in enumerate(self._entries(f,capacity)) if length]
+
+    def _map(self,doc_id:int)->Optional[mmap.mmap]:
+        doc_id=int(doc_id)
+        mapped=self._maps.get(doc_id)
+        if mapped is not None:
+            self._maps.move_to_end(doc_id)
+            return mapped
+        try:
+            with open(self._path(doc_id),"rb") as f:
+                mapped=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        self._maps[doc_id]=mapped
+        while len(self._maps)>self.max_open:
+            _,evicted=self._maps.popitem(last=False)
+            evicted.close()
+        return mapped
+
+    def get_entry(self,doc_id:int,page_number:int)->Optional[tuple]:
+        '''
+        Encoded bytes and codec name of a page, or None if it is not stored
+        '''
+        doc_id=int(doc_id)
+        with self._read_lock:
+            for attempt in range(2):
+                mapped=self._map(doc_id)
+                if mapped is None:
+                    return None
+                _,_,flags,capacity,_=HEADER.unpack_from(mapped,0)
+                if flags&FLAG_SUPERSEDED:
+                    self._maps.pop(doc_id).close()
+                    continue
+                if page_number<1 or page_number>capacity:
+                    return None
+                offset,length,codec=ENTRY.unpack_from(mapped,HEADER_SIZE+(page_number-1)*ENTRY.size)
+                if not length:
+                    return None
+                if offset+length>len(mapped):
+                    #Appended after this map was made
+                    self._maps.pop(doc_id).close()
+                    continue
+                return mapped[offset:offset+length],CODEC_NAMES.get(codec,"png")
+        return None
+
+    def get(self,doc_id:int,page_number:int)->Optional[bytes]:
+        '''
+        Encoded image bytes of a page, or None if it is not stored
+        '''
+        entry=self.get_entry(doc_id,page_number)
+        return entry[0] if entry else None
+
+    def stats(self)->Dict:
+        '''
+        Number of documents and pages and bytes on disk
+        '''
+        documents=self.document_ids()
+        return {
+            "root":self.root,
+            "documents":len(documents),
+            "pages":sum(len(self.pages(doc_id)) for doc_id in documents),
+            "bytes":sum(os.path.getsize(self._path(doc_id)) for doc_id in documents)
+        }
+
+    def close(self)->None:
+        with self._read_lock:
+            maps=list(self._maps.values())
+            self._maps.clear()
+        for mapped in maps:
+            mapped.close()
@@ -0,0 +1,96 @@
+import io
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict
+from PIL import Image
+from .page_store import PageStore
+
+#Codec name -> PIL format
+PAGE_IMAGE_FORMATS={"png":"PNG","jpeg":"JPEG","webp":"WEBP"}
+
+
+class PageWriter:
+    '''
+    Encodes page images on a background thread and stores them in a PageStore.
+
+    submit() returns a Future resolved with the encode time and bytes stored once the
+    page is readable from the store. At most max_pending pages wait for the writer,
+    which bounds the full-resolution bitmaps held in memory when encoding falls behind.
+    quality applies to JPEG and WebP, png_compress_level (0-9) to PNG.
+    '''
+    def __init__(self,store:PageStore,image_format:str="png",quality:int=90,png_compress_level:int=6,max_pending:int=8):
+        image_format=image_format.lower()
+        if image_format=="jpg":
+            image_format="jpeg"
+        if image_format not in PAGE_IMAGE_FORMATS:
+            raise ValueError(f"[ERROR] Unsupported page image format: {image_format}")
+        self.store=store
+        self.codec=image_format
+        self.format=PAGE_IMAGE_FORMATS[image_format]
+        if self.format=="PNG":
+            self.save_options={"compress_level":png_compress_level}
+        else:
+            self.save_options={"quality":quality}
+        self._queue=queue.Queue(maxsize=max(1,max_pending))
+        self._thread=None
+        self._lock=threading.Lock()
+
+    def encode(self,image:Image.Image)->Dict:
+        '''
+        Encode one page image with the configured codec
+        '''
+        started=time.perf_counter()
+        buffer=io.BytesIO()
+        image.save(buffer,format=self.format,**self.save_options)
+        return {"data":buffer.getvalue(),"encode_ms":(time.perf_counter()-started)*1000.0}
+
+    def store_encoded(self,doc_id:int,page_number:int,encoded:Dict)->Dict:
+        '''
+        Store a page encoded by encode(), possibly in another process
+        '''
+        self.store.put(doc_id,page_number,encoded["data"],self.codec)
+        return {"encode_ms":encoded["encode_ms"],"bytes":len(encoded["data"])}
+
+    def write(self,image:Image.Image,doc_id:int,page_number:int)->Dict:
+        '''
+        Encode and store one page image on the calling thread
+        '''
+        return self.store_encoded(doc_id,page_number,self.encode(image))
+
+    def submit(self,image:Image.Image,doc_id:int,page_number:int)->Future:
+        '''
+        Queue a page image for the writer thread; blocks while max_pending pages are waiting
+        '''
+        with self._lock:
+            #Started on first use so a forked process gets its own thread
+            if self._thread is None:
+                self._thread=threading.Thread(target=self._run,name="page-writer",daemon=True)
+                self._thread.start()
+        future=Future()
+        self._queue.put((image,doc_id,page_number,future))
+        return future
+
+    def _run(self)->None:
+        while True:
+            item=self._queue.get()
+            if item is None:
+                return
+            image,doc_id,page_number,future=item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self.write(image,doc_id,page_number))
+            except Exception as e:
+                future.set_exception(e)
+
+    def close(self)->None:
+        '''
+        Finish queued writes and stop the writer thread
+        '''
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread=None
@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List,Iterator
+import numpy as np
+
+#Set in the parent before workers fork so they inherit the loaded model copy-on-write
+_worker_encoder=None
+
+
+def _init_worker(num_threads:int)->None:
+    import torch
+    torch.set_num_threads(num_threads)
+
+
+def _embed_chunk(images:List)->List[np.ndarray]:
+    return _worker_encoder.get_image_embeddings(images)
+
+
+class ParallelImageEncoder:
+    '''
+    Shards page embedding across a pool of forked worker processes.
+
+    Workers are forked after the model is loaded, so the read-only weights are
+    shared with the parent instead of being loaded again. Each worker gets its
+    own intra-op thread budget. Results are returned in page order.
+    Call start() right after loading the model and before any forward pass, from
+    a thread that runs while no other thread can hold a lock the children need:
+    a fork can inherit held OpenMP and intra-op thread pool locks and hang. The
+    server does this by building the pipeline in its entry point, before it starts
+    serving. The pool is forked once; if a worker dies, the remaining pages and
+    all later ones are embedded in the current process instead of forking again
+    after forward passes have run. Forked children cannot use an initialized CUDA
+    or MPS context, so on those devices, and on platforms without fork, pages are
+    embedded in the current process.
+    '''
+    def __init__(self,encoder,num_workers:int,threads_per_worker:int=None,chunk_size:int=2):
+        self.encoder=encoder
+        self.num_workers=max(1,num_workers)
+        self.threads_per_worker=threads_per_worker or max(1,(os.cpu_count() or 1)//self.num_workers)
+        self.chunk_size=max(1,chunk_size)
+        self._executor=None
+        device=str(getattr(encoder,"device","cpu"))
+        self.supported="fork" in multiprocessing.get_all_start_methods() and device=="cpu"
+        if "fork" not in multiprocessing.get_all_start_methods():
+            print("[WARNING] Process fork is unavailable, parallel page embedding falls back to a single process")
+        elif device!="cpu":
+            print(f"[WARNING] Forked workers cannot share the {device} context, parallel page embedding falls back to a single process")
+
+    def start(self)->None:
+        '''
+        Fork the workers now, before the first forward pass
+        '''
+        if self.supported:
+            #With fork, the first task launches every worker of the pool
+            self._get_executor().submit(os.getpid).result()
+
+    def _get_executor(self)->ProcessPoolExecutor:
+        global _worker_encoder
+        if self._executor is None:
+            _worker_encoder=self.encoder
+            self._executor=ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker,
+                initargs=(self.threads_per_worker,)
+            )
+            print(f"[INFO] Started {self.num_workers} embedding workers with {self.threads_per_worker} threads each")
+        return self._executor
+
+    def _chunks(self,images:List)->List[List]:
+        #Spread small batches across all workers, larger ones in chunk_size pieces
+        size=max(1,min(self.chunk_size,-(-len(images)//self.num_workers)))
+        return [images[i:i+size] for i in range(0,len(images),size)]
+
+    def iter_image_embeddings(self,images:List)->Iterator[np.ndarray]:
+        '''
+        Yield page embeddings in page order as worker chunks complete
+        '''
+        if not images:
+            return
+        if not self.supported:
+            yield from self.encoder.get_image_embeddings(images)
+            return
+        try:
+            for embeddings in self._get_executor().map(_embed_chunk,self._chunks(images)):
+                yield from embeddings
+        except BrokenProcessPool as e:
+            #A worker died, most likely killed for using too much memory. Forking again now would
+            #happen after forward passes, so the caller's retry and later batches run in-process.
+            self.close()
+            self.supported=False
+            print("[WARNING] Embedding worker died, parallel page embedding falls back to a single process")
+            raise MemoryError(f"Embedding worker died, out of memory: {e}")
+
+    def get_image_embeddings(self,images:List)->List[np.ndarray]:
+        return list(self.iter_image_embeddings(images))
+
+    def close(self)->None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False,cancel_futures=True)
+            self._executor=None
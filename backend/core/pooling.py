@@ -0,0 +1,82 @@
+import numpy as np
+from typing import List
+
+POOL_METHODS=("hierarchical","sequential")
+
+
+class TokenPooler:
+    '''
+    Shrinks ColPali page multivectors by pooling patch embeddings at index time.
+    A pool factor of k keeps roughly tokens/k vectors per page.
+
+    Methods:
+        hierarchical: ward clustering of the patch vectors, mean of each cluster
+        sequential: mean of each run of k consecutive tokens
+    '''
+    def __init__(self,pool_factor:int=1,method:str="hierarchical"):
+        if pool_factor<1:
+            raise ValueError(f"pool_factor must be >= 1, got {pool_factor}")
+        if method not in POOL_METHODS:
+            raise ValueError(f"Unknown pooling method '{method}', expected one of {POOL_METHODS}")
+        self.pool_factor=pool_factor
+        self.method=method
+
+    def pool(self,embeddings:List[np.ndarray])->List[np.ndarray]:
+        '''
+        Pool each (tokens, dim) page embedding in the list
+        '''
+        if self.pool_factor==1:
+            return embeddings
+        return [self._pool_one(embedding) for embedding in embeddings]
+
+    def _pool_one(self,embedding:np.ndarray)->np.ndarray:
+        if self.method=="sequential":
+            pooled=self._sequential(embedding)
+        else:
+            pooled=self._hierarchical(embedding)
+        return np.ascontiguousarray(pooled,dtype=embedding.dtype)
+
+    def _sequential(self,embedding:np.ndarray)->np.ndarray:
+        tokens,dim=embedding.shape
+        groups=-(-tokens//self.pool_factor)
+        padded=np.zeros((groups*self.pool_factor,dim),dtype=np.float32)
+        padded[:tokens]=embedding
+        counts=np.full(groups,self.pool_factor,dtype=np.float32)
+        counts[-1]=tokens-(groups-1)*self.pool_factor
+        return padded.reshape(groups,self.pool_factor,dim).sum(axis=1)/counts[:,None]
+
+    def _hierarchical(self,embedding:np.ndarray)->np.ndarray:
+        from scipy.cluster.hierarchy import fcluster,linkage
+
+        vectors=embedding.astype(np.float32)
+        n_clusters=max(1,vectors.shape[0]//self.pool_factor)
+        if n_clusters>=vectors.shape[0]:
+            return vectors
+        #Cluster on normalized vectors so grouping follows cosine similarity
+        normalized=vectors/np.linalg.norm(vectors,axis=1,keepdims=True).clip(min=1e-12)
+        labels=fcluster(linkage(normalized,method="ward"),t=n_clusters,criterion="maxclust")
+        pooled=np.zeros((labels.max(),vectors.shape[1]),dtype=np.float32)
+        np.add.at(pooled,labels-1,vectors)
+        pooled/=np.bincount(labels-1)[:,None]
+        return pooled
+
+
+PREFETCH_POOLINGS=("mean","rows")
+
+
+def prefetch_vectors(embedding:np.ndarray,method:str="mean",grid:int=32)->np.ndarray:
+    '''
+    Cheap multivector used to prefetch candidates before full MaxSim reranking.
+
+    Methods:
+        mean: a single mean-pooled vector per page
+        rows: mean of each patch row and each patch column of the grid x grid
+              patch layout, falling back to mean when the page has fewer patches
+    '''
+    vectors=np.asarray(embedding,dtype=np.float32)
+    if method=="rows" and vectors.shape[0]>=grid*grid:
+        patches=vectors[:grid*grid].reshape(grid,grid,-1)
+        pooled=np.concatenate([patches.mean(axis=1),patches.mean(axis=0)])
+    else:
+        pooled=vectors.mean(axis=0,keepdims=True)
+    return np.ascontiguousarray(pooled)
@@ -1,15 +1,68 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+import uuid
 import qdrant_client
+import numpy as np
 from typing import List,Dict
 from qdrant_client.http import models
 from .colpali_client import ColpaliClient
+from .pooling import TokenPooler,prefetch_vectors
+from .batch_sizer import AdaptiveBatchSizer,is_out_of_memory
 
+#Named vectors of two-stage collections
+ORIGINAL_VECTOR="original"
+PREFETCH_VECTOR="prefetch"
+QUANTIZATION_MODES=("scalar","binary")
+#Collection the application indexes pages into
+COLLECTION_NAME="test"
+#Payload fields needed to locate and describe a retrieved page
+RESULT_PAYLOAD_FIELDS=["doc_id","page_num","source"]
+#Namespace for deterministic point ids
+POINT_ID_NAMESPACE=uuid.UUID("5b7e2f8c-3c1d-4a52-9a57-0c6f1e2d4b13")
 
-class VectorDBClient:
-    def __init__(self,url:str,api_key:str):
-        self.client=qdrant_client.QdrantClient(
-            url=url,
-            api_key=api_key
+#Async clients are shared per connection settings and driven from one background loop
+_async_lock=threading.Lock()
+_async_loop=None
+_async_clients={}
+
+
+def quantization_config(mode:str,always_ram:bool=True):
+    '''
+    Qdrant quantization config for "scalar" (int8) or "binary" quantization, None for no quantization.
+    With always_ram the quantized copy stays in RAM while the float vectors stay on disk.
+    '''
+    if not mode:
+        return None
+    if mode=="scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=always_ram
+            )
         )
+    if mode=="binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=always_ram)
+        )
+    raise ValueError(f"Unknown quantization '{mode}', expected one of {QUANTIZATION_MODES}")
+
+
+class VectorDBClient:
+    def __init__(self,url:str,api_key:str,prefer_grpc:bool=False,grpc_port:int=6334):
+        self._named_vectors={}
+        if url==":memory:":
+            #Local in-process mode, used by benchmarks and tests
+            self.client=qdrant_client.QdrantClient(location=":memory:")
+        else:
+            self.client=qdrant_client.QdrantClient(
+                url=url,
+                api_key=api_key,
+                prefer_grpc=prefer_grpc,
+                grpc_port=grpc_port
+            )
         
     def _get_client_info(self):
         '''
@@ -23,80 +76,504 @@ class VectorDBClient:
         '''
         return self.client.get_collections()
     
-    def create_collection(self,name:str='test',vector_size:int=128)->None:
+    def create_collection(self,name:str='test',vector_size:int=128,two_stage:bool=True,
+                          quantization:str=None)->None:
         '''
-        Creates a collection with the given name and vextor size
+        Creates a collection with the given name and vextor size.
+        Two-stage collections store the page multivector as the "original" named vector
+        next to a small pooled "prefetch" multivector used to shortlist candidates.
+        quantization ("scalar" or "binary") keeps a RAM-resident quantized copy of the vectors.
         '''
+        original=models.VectorParams(
+            size=vector_size,
+            distance=models.Distance.COSINE,
+            on_disk=True,
+            multivector_config=models.MultiVectorConfig(
+                comparator=models.MultiVectorComparator.MAX_SIM
+            ),
+        )
+        if two_stage:
+            vectors_config={
+                ORIGINAL_VECTOR:original,
+                PREFETCH_VECTOR:models.VectorParams(
+                    size=vector_size,
+                    distance=models.Distance.COSINE,
+                    multivector_config=models.MultiVectorConfig(
+                        comparator=models.MultiVectorComparator.MAX_SIM
+                    ),
+                ),
+            }
+        else:
+            vectors_config=original
         self.client.create_collection(
             collection_name=name,
             on_disk_payload=True,
-            vectors_config=models.VectorParams(
-                size=vector_size,
-                distance=models.Distance.COSINE,
-                on_disk=True,
-                multivector_config=models.MultiVectorConfig(
-                    comparator=models.MultiVectorComparator.MAX_SIM
-                ),
+            vectors_config=vectors_config,
+            quantization_config=quantization_config(quantization),
+        )
+        self._named_vectors[name]=two_stage
+        self.create_payload_indexes(name)
+    
+    def create_payload_indexes(self,name:str='test')->None:
+        '''
+        Index the payload fields searches and deletes filter on. owner_id is the tenant key,
+        so Qdrant keeps each owner's points together and a scoped search only visits them.
+        '''
+        indexes={
+            "owner_id":models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD,is_tenant=True),
+            "doc_id":models.IntegerIndexParams(type=models.IntegerIndexType.INTEGER,lookup=True,range=False),
+            "page_num":models.IntegerIndexParams(type=models.IntegerIndexType.INTEGER,lookup=False,range=True),
+        }
+        for field_name,field_schema in indexes.items():
+            self.client.create_payload_index(
+                collection_name=name,
+                field_name=field_name,
+                field_schema=field_schema,
+                wait=True
+            )
+    
+    @staticmethod
+    def scope_filter(owner_id=None,document_ids:List[int]=None):
+        '''
+        Payload filter restricting a search to one owner and optionally a subset of their documents
+        '''
+        conditions=[]
+        if owner_id is not None:
+            conditions.append(models.FieldCondition(key="owner_id",match=models.MatchValue(value=str(owner_id))))
+        if document_ids:
+            conditions.append(models.FieldCondition(key="doc_id",match=models.MatchAny(any=[int(i) for i in document_ids])))
+        return models.Filter(must=conditions) if conditions else None
+    
+    def enable_quantization(self,name:str,quantization:str)->bool:
+        '''
+        Add quantization to an existing collection that has none.
+        Returns True if the collection was updated.
+        '''
+        if not quantization or self.client.get_collection(name).config.quantization_config is not None:
+            return False
+        self.client.update_collection(
+            collection_name=name,
+            quantization_config=quantization_config(quantization)
+        )
+        print(f"[INFO] Enabled {quantization} quantization on collection '{name}'")
+        return True
+    
+    def uses_named_vectors(self,collection_name:str)->bool:
+        '''
+        True when the collection was created with two-stage named vectors
+        '''
+        if collection_name not in self._named_vectors:
+            vectors=self.client.get_collection(collection_name).config.params.vectors
+            self._named_vectors[collection_name]=isinstance(vectors,dict)
+        return self._named_vectors[collection_name]
+    
+    @staticmethod
+    def point_id(doc_id,page_number:int,revision:str)->str:
+        '''
+        Stable point id for a page of a document under a given model revision
+        '''
+        return str(uuid.uuid5(POINT_ID_NAMESPACE,f"{doc_id}:{page_number}:{revision}"))
+    
+    def get_fingerprints(self,point_ids:List[str],collection_name:str='test',chunk_size:int=256)->Dict[str,str]:
+        '''
+        Return the stored content fingerprint of each existing point, keyed by point id
+        '''
+        fingerprints={}
+        for i in range(0,len(point_ids),chunk_size):
+            records=self.client.retrieve(
+                collection_name=collection_name,
+                ids=point_ids[i:i+chunk_size],
+                with_payload=["fingerprint"],
+                with_vectors=False
+            )
+            for record in records:
+                fingerprints[str(record.id)]=(record.payload or {}).get("fingerprint")
+        return fingerprints
+    
+    def delete_stale_pages(self,doc_id,page_count:int,revision:str,collection_name:str='test')->None:
+        '''
+        Delete a document's points beyond its current page count or from other model revisions
+        '''
+        self.client.delete(
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(
+                    must=[models.FieldCondition(key="doc_id",match=models.MatchValue(value=doc_id))],
+                    should=[
+                        models.FieldCondition(key="page_num",range=models.Range(gt=page_count)),
+                        models.Filter(must_not=[
+                            models.FieldCondition(key="revision",match=models.MatchValue(value=revision))
+                        ])
+                    ]
+                )
+            ),
+            wait=True
+        )
+    
+    def delete_documents(self,doc_ids:List[int],collection_name:str='test')->None:
+        '''
+        Delete every point of the given documents
+        '''
+        if not doc_ids:
+            return
+        self.client.delete(
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(
+                    must=[models.FieldCondition(key="doc_id",match=models.MatchAny(any=list(doc_ids)))]
+                )
+            ),
+            wait=True
+        )
+    
+    def indexed_document_ids(self,collection_name:str='test',page_size:int=1024)->set:
+        '''
+        Distinct doc_id values of the points in the collection
+        '''
+        doc_ids=set()
+        offset=None
+        while True:
+            records,offset=self.client.scroll(
+                collection_name=collection_name,
+                with_payload=["doc_id"],
+                with_vectors=False,
+                limit=page_size,
+                offset=offset
+            )
+            doc_ids.update((record.payload or {}).get("doc_id") for record in records)
+            if offset is None:
+                break
+        doc_ids.discard(None)
+        return doc_ids
+    
+    def unowned_document_ids(self,collection_name:str='test',page_size:int=1024)->set:
+        '''
+        Distinct doc_id values of points without an owner_id, indexed before pages recorded their owner
+        '''
+        doc_ids=set()
+        offset=None
+        while True:
+            records,offset=self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=models.Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key="owner_id"))]),
+                with_payload=["doc_id"],
+                with_vectors=False,
+                limit=page_size,
+                offset=offset
+            )
+            doc_ids.update((record.payload or {}).get("doc_id") for record in records)
+            if offset is None:
+                break
+        doc_ids.discard(None)
+        return doc_ids
+    
+    def set_document_owner(self,doc_id:int,owner_id,collection_name:str='test')->None:
+        '''
+        Record the owner on every point of a document
+        '''
+        self.client.set_payload(
+            collection_name=collection_name,
+            payload={"owner_id":str(owner_id)},
+            points=models.Filter(
+                must=[models.FieldCondition(key="doc_id",match=models.MatchValue(value=doc_id))]
             ),
+            wait=True
         )
     
-    def create_points(self,colpali_client: ColpaliClient,dataset:List[Dict],batch_size:int=5)->List:
+    def create_points(self,colpali_client: ColpaliClient,dataset:List[Dict],batch_size:int=None,
+                      pooler:TokenPooler=None,batch_sizer:AdaptiveBatchSizer=None,
+                      prefetch_pooling:str=None,revision:str="")->List[Dict]:
         '''
-        Creates points containing all the metadata for image and its vectors to insert to qdrant DB
+        Creates points containing all the metadata for image and its vectors to insert to qdrant DB.
+        Vectors are kept as NumPy arrays and only converted when the points are upserted.
+        When a pooler is given, page multivectors are pooled before they are stored.
+        Batch sizes come from the batch sizer; a fixed batch_size caps it instead.
+        With prefetch_pooling, each point also carries the pooled prefetch vector
+        computed from the unpooled page embedding.
+        Point ids are derived from the document id, page number and revision.
         '''
+        if batch_sizer is None:
+            batch_sizer=AdaptiveBatchSizer(max_size=batch_size or 32,initial_size=batch_size)
+        pool_factor=pooler.pool_factor if pooler else 1
         points=[]
-        for i in range(0,len(dataset),batch_size):
-            batch=dataset[i:i+batch_size]
+        started=time.perf_counter()
+        i=0
+        while i<len(dataset):
+            size=batch_sizer.next_size([item['image'] for item in dataset[i:i+batch_sizer.max_size]])
+            batch=dataset[i:i+size]
             images=[item['image'] for item in batch]
             
-            image_embeddings=colpali_client.get_image_embeddings(images)
+            batch_started=time.perf_counter()
+            try:
+                image_embeddings=colpali_client.get_image_embeddings(images)
+            except Exception as e:
+                if not is_out_of_memory(e):
+                    raise
+                batch_sizer.on_oom(len(batch))
+                continue
+            elapsed=time.perf_counter()-batch_started
+            #Pages served from the embedding store took no forward pass and would skew the latency baseline
+            reused=colpali_client.last_reused() if hasattr(colpali_client,"last_reused") else 0
+            if not reused:
+                batch_sizer.record(len(batch),elapsed)
+            
+            prefetch=[prefetch_vectors(embedding,prefetch_pooling) for embedding in image_embeddings] if prefetch_pooling else None
+            if pooler:
+                image_embeddings=pooler.pool(image_embeddings)
             for j,embedding in enumerate(image_embeddings):
-                points.append(
-                    models.PointStruct(
-                        id=i+j,
-                        vector=embedding, #add tolist if need
-                        payload={
-                            "doc_id": batch[j]["doc_id"],
-                            "page_num": batch[j]["page_number"],
-                            "source": batch[j]['filename']
-                        },
-                    )
-                )
-            print(f"[INFO] Created {len(points)} points.")
+                point={
+                    "id":self.point_id(batch[j]["doc_id"],batch[j]["page_number"],revision),
+                    "vector":embedding,
+                    "payload":{
+                        "doc_id": batch[j]["doc_id"],
+                        "owner_id": str(batch[j]["owner_id"]) if batch[j].get("owner_id") is not None else None,
+                        "page_num": batch[j]["page_number"],
+                        "source": batch[j]['filename'],
+                        "pool_factor": pool_factor,
+                        "revision": revision,
+                        "fingerprint": batch[j].get("fingerprint")
+                    }
+                }
+                if prefetch:
+                    point["prefetch_vector"]=prefetch[j]
+                points.append(point)
+            i+=len(batch)
+            print(f"[INFO] Created {len(points)} points (batch size {len(batch)}, {len(batch)/elapsed:.2f} pages/sec).")
+        total=time.perf_counter()-started
+        if points:
+            print(f"[INFO] Embedded {len(points)} pages in {total:.1f}s ({len(points)/total:.2f} pages/sec).")
         return points
     
-    def insert_data(self,points:List,dataset:List[Dict],batch_size:int=5,collection_name:str='test')->None:
+    @staticmethod
+    def _to_point_struct(point:Dict,named_vectors:bool=False)->models.PointStruct:
+        '''
+        Serialize an array-backed point into the PointStruct sent to Qdrant
+        '''
+        vector=np.asarray(point["vector"],dtype=np.float32).tolist()
+        if named_vectors:
+            prefetch=point.get("prefetch_vector")
+            if prefetch is None:
+                prefetch=prefetch_vectors(point["vector"])
+            vector={
+                ORIGINAL_VECTOR:vector,
+                PREFETCH_VECTOR:np.asarray(prefetch,dtype=np.float32).tolist()
+            }
+        return models.PointStruct(
+            id=point["id"],
+            vector=vector,
+            payload=point["payload"]
+        )
+    
+    def upsert_batch(self,points:List[Dict],collection_name:str='test',wait:bool=True)->None:
+        '''
+        Serialize and upsert one batch of points. With wait=False Qdrant acknowledges
+        the batch once it is accepted, before it has been applied.
+        '''
+        named_vectors=self.uses_named_vectors(collection_name)
+        self.client.upsert(
+            collection_name=collection_name,
+            points=[self._to_point_struct(point,named_vectors) for point in points],
+            wait=wait
+        )
+    
+    def insert_data(self,points:List[Dict],dataset:List[Dict],batch_size:int=5,collection_name:str='test')->None:
         '''
         Upsert points data to the collection 
         '''
         for i in range(0,len(points),batch_size):
             batch_points=points[i:i+batch_size]
             try:
-                self.client.upsert(
-                    collection_name=collection_name,
-                    points=batch_points,
-                    wait=True
-                )
+                self.upsert_batch(batch_points,collection_name)
                 print(f"[INFO] Inserted {len(batch_points)} points.")
             except Exception as e:
                 print(f"[ERROR] An Error occured during insertion: {e}")
                 continue
         print(f"[INFO] Data inserted successfully")
         
-    def search(self,user_query:List,collection_name:str='test')->List:
+    @staticmethod
+    def query_request(user_query:np.ndarray,named_vectors:bool,prefetch_limit:int=None,
+                      use_quantization:bool=True,oversampling:float=2.0,rescore:bool=True,
+                      owner_id=None,document_ids:List[int]=None,limit:int=5,score_threshold:float=None,
+                      with_payload=True,with_vectors:bool=False)->Dict:
+        '''
+        Keyword arguments of query_points for a search, shared by the sync and async clients
+        '''
+        query_filter=VectorDBClient.scope_filter(owner_id,document_ids)
+        query=np.asarray(user_query,dtype=np.float32).tolist()
+        search_params=models.SearchParams(
+            quantization=models.QuantizationSearchParams(
+                ignore=not use_quantization,
+                rescore=rescore,
+                oversampling=oversampling
+            )
+        )
+        using=None
+        prefetch=None
+        if named_vectors:
+            using=ORIGINAL_VECTOR
+            if prefetch_limit:
+                #The shortlist must be at least as deep as the final result
+                prefetch=models.Prefetch(query=query,using=PREFETCH_VECTOR,limit=max(prefetch_limit,limit),
+                                         filter=query_filter,params=search_params)
+        return {
+            "query":query,
+            "using":using,
+            "prefetch":prefetch,
+            "query_filter":query_filter,
+            "limit":limit,
+            "score_threshold":score_threshold,
+            "with_payload":with_payload,
+            "with_vectors":with_vectors,
+            "search_params":search_params
+        }
+    
+    def search(self,user_query:np.ndarray,collection_name:str='test',prefetch_limit:int=None,
+               use_quantization:bool=True,oversampling:float=2.0,rescore:bool=True,
+               owner_id=None,document_ids:List[int]=None,limit:int=5,score_threshold:float=None,
+               with_payload=True,with_vectors:bool=False)->List:
         '''
-        Search and retrive the points which match the user query 
+        Search and retrive the points which match the user query.
+        On two-stage collections with a prefetch_limit, the pooled vectors shortlist
+        prefetch_limit candidates and only those are reranked with full MaxSim.
+        On quantized collections, use_quantization scores with the quantized vectors,
+        fetching oversampling times more candidates and optionally rescoring them
+        with the original vectors.
+        owner_id and document_ids restrict both stages to one owner's documents.
+        limit and score_threshold bound the returned points, with_payload (True or a list of
+        field names) and with_vectors control what each point carries back.
         '''
-        result=self.client.query_points(
+        return self.client.query_points(
             collection_name=collection_name,
-            query=user_query,
-            limit=5,
-            search_params=models.SearchParams(
-                quantization=models.QuantizationSearchParams(
-                    ignore=True,
-                    rescore=True,
-                    oversampling=2.0
-                )
+            **self.query_request(
+                user_query,
+                self.uses_named_vectors(collection_name),
+                prefetch_limit=prefetch_limit,
+                use_quantization=use_quantization,
+                oversampling=oversampling,
+                rescore=rescore,
+                owner_id=owner_id,
+                document_ids=document_ids,
+                limit=limit,
+                score_threshold=score_threshold,
+                with_payload=with_payload,
+                with_vectors=with_vectors
             )
         )
-        return result
\ No newline at end of file
+
+    @staticmethod
+    def batch_request(request:Dict)->models.QueryRequest:
+        '''
+        Convert query_points keyword arguments into one request of a query_batch_points call
+        '''
+        return models.QueryRequest(
+            query=request["query"],
+            using=request["using"],
+            prefetch=request["prefetch"],
+            filter=request["query_filter"],
+            params=request["search_params"],
+            limit=request["limit"],
+            score_threshold=request["score_threshold"],
+            with_payload=request["with_payload"],
+            with_vector=request["with_vectors"]
+        )
+    
+    def search_batch(self,user_queries:List[np.ndarray],collection_name:str='test',**options)->List:
+        '''
+        Run several searches in one query_batch_points round trip.
+        Accepts the same options as search and returns one response per query, in order.
+        '''
+        named_vectors=self.uses_named_vectors(collection_name)
+        requests=[self.batch_request(self.query_request(query,named_vectors,**options)) for query in user_queries]
+        return self.client.query_batch_points(collection_name=collection_name,requests=requests)
+
+
+def _client_loop()->asyncio.AbstractEventLoop:
+    '''
+    Event loop on a daemon thread that owns the shared async Qdrant clients.
+    Flask runs every async view in its own short-lived loop, so pooled connections
+    cannot live there; requests hand their coroutines over to this loop instead.
+    '''
+    global _async_loop
+    with _async_lock:
+        if _async_loop is None:
+            _async_loop=asyncio.new_event_loop()
+            threading.Thread(target=_async_loop.run_forever,name="qdrant-async",daemon=True).start()
+        return _async_loop
+
+
+def shared_async_client(url:str,api_key:str=None,prefer_grpc:bool=False,grpc_port:int=6334)->qdrant_client.AsyncQdrantClient:
+    '''
+    Process-wide AsyncQdrantClient for the given connection settings, created on the client loop
+    '''
+    key=(url,api_key,prefer_grpc,grpc_port)
+    loop=_client_loop()
+    with _async_lock:
+        client=_async_clients.get(key)
+    if client is not None:
+        return client
+
+    async def create():
+        if url==":memory:":
+            return qdrant_client.AsyncQdrantClient(location=":memory:")
+        return qdrant_client.AsyncQdrantClient(url=url,api_key=api_key,prefer_grpc=prefer_grpc,grpc_port=grpc_port)
+
+    client=asyncio.run_coroutine_threadsafe(create(),loop).result()
+    with _async_lock:
+        #Another thread may have created one meanwhile, keep the first
+        client=_async_clients.setdefault(key,client)
+    return client
+
+
+class AsyncVectorDBClient:
+    '''
+    Awaitable search and upsert over one shared, pooled AsyncQdrantClient, over REST or gRPC.
+    Calls can be awaited from any event loop; they run on the client loop so Flask workers
+    are free while Qdrant works. Collection management stays with VectorDBClient.
+    '''
+    def __init__(self,url:str,api_key:str=None,prefer_grpc:bool=False,grpc_port:int=6334):
+        self._loop=_client_loop()
+        self.client=shared_async_client(url,api_key,prefer_grpc,grpc_port)
+        self.transport="grpc" if prefer_grpc and url!=":memory:" else "rest"
+        self._named_vectors={}
+
+    async def _call(self,coro):
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro,self._loop))
+
+    def submit(self,coro)->concurrent.futures.Future:
+        '''
+        Run a coroutine on the client loop from synchronous code, e.g. the ingestion upserter keeping several aupsert calls in flight
+        '''
+        return asyncio.run_coroutine_threadsafe(coro,self._loop)
+
+    async def uses_named_vectors(self,collection_name:str)->bool:
+        '''
+        True when the collection was created with two-stage named vectors
+        '''
+        if collection_name not in self._named_vectors:
+            info=await self._call(self.client.get_collection(collection_name))
+            self._named_vectors[collection_name]=isinstance(info.config.params.vectors,dict)
+        return self._named_vectors[collection_name]
+
+    async def upsert_batch(self,points:List[Dict],collection_name:str='test',wait:bool=True)->None:
+        '''
+        Serialize and upsert one batch of points, see VectorDBClient.upsert_batch
+        '''
+        named_vectors=await self.uses_named_vectors(collection_name)
+        structs=[VectorDBClient._to_point_struct(point,named_vectors) for point in points]
+        await self._call(self.client.upsert(collection_name=collection_name,points=structs,wait=wait))
+
+    async def search(self,user_query:np.ndarray,collection_name:str='test',**options):
+        '''
+        Search the collection, accepting the same options as VectorDBClient.search
+        '''
+        named_vectors=await self.uses_named_vectors(collection_name)
+        request=VectorDBClient.query_request(user_query,named_vectors,**options)
+        return await self._call(self.client.query_points(collection_name=collection_name,**request))
+
+    async def search_batch(self,user_queries:List[np.ndarray],collection_name:str='test',**options)->List:
+        '''
+        Several searches in one round trip, see VectorDBClient.search_batch
+        '''
+        named_vectors=await self.uses_named_vectors(collection_name)
+        requests=[VectorDBClient.batch_request(VectorDBClient.query_request(query,named_vectors,**options)) for query in user_queries]
+        return await self._call(self.client.query_batch_points(collection_name=collection_name,requests=requests))
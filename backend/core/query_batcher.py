@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from typing import List,Dict
+from .colpali_client import ColpaliClient
+from .metrics import Histogram
+
+BATCH_SIZE_BUCKETS=[1,2,4,8,16,32,64]
+QUEUE_WAIT_MS_BUCKETS=[1,2,5,10,20,50,100,250,500,1000]
+
+
+class QueryBatcher:
+    '''
+    Collects concurrent query embedding requests and runs them through Colpali
+    as one batch. A batch is flushed when it reaches max_batch_size or when the
+    oldest request has waited max_wait_ms, whichever comes first.
+    '''
+    def __init__(self,colpali_client:ColpaliClient,max_batch_size:int=8,max_wait_ms:float=10.0,report_every:int=100):
+        self.colpali=colpali_client
+        self.max_batch_size=max(1,max_batch_size)
+        self.max_wait=max_wait_ms/1000.0
+        self.report_every=report_every
+        self.batch_sizes=Histogram("query_batch_size",BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms=Histogram("query_queue_wait_ms",QUEUE_WAIT_MS_BUCKETS)
+        self._queue=queue.Queue()
+        self._batches=0
+        self._thread=threading.Thread(target=self._run,name="colpali-query-batcher",daemon=True)
+        self._thread.start()
+
+    def get_query_embeddings(self,query:str,timeout:float=None)->np.ndarray:
+        '''
+        Queue a query for the next batch and block until its embedding is ready
+        '''
+        future=Future()
+        self._queue.put((query,time.perf_counter(),future))
+        return future.result(timeout=timeout)
+
+    def get_query_embeddings_batch(self,queries:List[str])->List[np.ndarray]:
+        '''
+        Encode a caller's own batch directly, it is already one forward pass
+        '''
+        return self.colpali.get_query_embeddings_batch(queries)
+
+    def _collect(self)->List:
+        '''
+        Wait for the first request, then gather more until the window closes or the batch is full
+        '''
+        first=self._queue.get()
+        if first is None:
+            return None
+        batch=[first]
+        deadline=time.perf_counter()+self.max_wait
+        while len(batch)<self.max_batch_size:
+            remaining=deadline-time.perf_counter()
+            if remaining<=0:
+                break
+            try:
+                item=self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self)->None:
+        while True:
+            batch=self._collect()
+            if batch is None:
+                return
+            started=time.perf_counter()
+            for _,enqueued,_ in batch:
+                self.queue_wait_ms.observe((started-enqueued)*1000.0)
+            self.batch_sizes.observe(len(batch))
+
+            queries=[query for query,_,_ in batch]
+            try:
+                embeddings=self.colpali.get_query_embeddings_batch(queries)
+            except Exception as e:
+                print(f"[ERROR] Query batch of {len(batch)} failed: {e}")
+                for _,_,future in batch:
+                    future.set_exception(e)
+                continue
+            for (_,_,future),embedding in zip(batch,embeddings):
+                future.set_result(embedding)
+
+            self._batches+=1
+            if self.report_every and self._batches%self.report_every==0:
+                self.report()
+
+    def stats(self)->Dict:
+        '''
+        Return batch-size and queue-wait histograms
+        '''
+        return {
+            "batches":self._batches,
+            "pending":self._queue.qsize(),
+            "batch_size":self.batch_sizes.snapshot(),
+            "queue_wait_ms":self.queue_wait_ms.snapshot()
+        }
+
+    def report(self)->None:
+        '''
+        Log a one-line summary of the batching histograms
+        '''
+        sizes=self.batch_sizes.snapshot()
+        waits=self.queue_wait_ms.snapshot()
+        print(f"[INFO] Query batcher: {self._batches} batches, "
+              f"batch size mean={sizes['mean']:.2f} p99<={sizes['p99']:g}, "
+              f"queue wait mean={waits['mean']:.2f}ms p99<={waits['p99']:g}ms")
+
+    def close(self)->None:
+        '''
+        Stop the worker thread after the queued requests are served
+        '''
+        self._queue.put(None)
+        self._thread.join()
@@ -1,7 +1,29 @@
-from core.rag_utils import MultiModalRAG
-from config.settings import QDRANT_URL, QDRANT_API_KEY
+import threading
+import time
+from config.settings import (
+    QDRANT_URL, QDRANT_API_KEY,
+    QUERY_BATCH_ENABLED, QUERY_BATCH_MAX_SIZE, QUERY_BATCH_WAIT_MS,
+    COLPALI_PROFILE, COLPALI_NUM_THREADS, EMBEDDING_DTYPE,
+    QUERY_CACHE_BACKEND, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_PATH,
+    POOL_FACTOR, POOL_METHOD,
+    EMBEDDING_STORE_DIR, EMBEDDING_STORE_MAX_GB,
+    EMBED_BATCH_MIN, EMBED_BATCH_MAX, EMBED_MEMORY_FRACTION,
+    EMBED_WORKERS, EMBED_THREADS_PER_WORKER,
+    PREFETCH_LIMIT, PREFETCH_POOLING,
+    QDRANT_QUANTIZATION, QDRANT_USE_QUANTIZATION, QDRANT_OVERSAMPLING, QDRANT_RESCORE,
+    INGEST_QUEUE_SIZE, UPSERT_CONCURRENCY, UPSERT_BATCH_SIZE,
+    SEARCH_TOP_K, SEARCH_SCORE_THRESHOLD,
+    QDRANT_PREFER_GRPC, QDRANT_GRPC_PORT, QDRANT_ASYNC,
+    VECTOR_BACKEND, LOCAL_INDEX_DIR,
+    PAGE_STORE_DIR
+)
 
 class RAGSingleton:
+    '''
+    Process-wide MultiModalRAG that is built on first use instead of at import time.
+    start_warmup() builds it in the background and runs a dummy query and page
+    through ColPali so the first real request does not pay for it.
+    '''
     _instance=None
     _initialized=False
     
@@ -12,15 +34,196 @@ class RAGSingleton:
     
     def __init__(self):
         if not RAGSingleton._initialized:
-            print("[INFO] Initializing RAG ...")
-            self._rag=MultiModalRAG(url=QDRANT_URL,api_key=QDRANT_API_KEY)
+            self._rag=None
+            self._lock=threading.Lock()
+            self._state="idle"
+            self._error=None
+            self._warmup_thread=None
+            self._ready_at=None
+            self._vector_client=None
+            self._client_lock=threading.Lock()
             RAGSingleton._initialized=True
-            print("[INFO] RAG singleton initialized successfully")
+    
+    def _build(self):
+        #Deferred so importing this module does not pull in torch and ColPali
+        from core.rag_utils import MultiModalRAG
+        
+        print("[INFO] Initializing RAG ...")
+        started=time.perf_counter()
+        rag=MultiModalRAG(
+            url=QDRANT_URL,
+            api_key=QDRANT_API_KEY,
+            image_dir=PAGE_STORE_DIR,
+            batch_queries=QUERY_BATCH_ENABLED,
+            query_batch_size=QUERY_BATCH_MAX_SIZE,
+            query_batch_wait_ms=QUERY_BATCH_WAIT_MS,
+            colpali_profile=COLPALI_PROFILE,
+            colpali_threads=COLPALI_NUM_THREADS,
+            embedding_dtype=EMBEDDING_DTYPE,
+            query_cache_backend=None if QUERY_CACHE_BACKEND=="none" else QUERY_CACHE_BACKEND,
+            query_cache_size=QUERY_CACHE_MAX_ENTRIES,
+            query_cache_ttl=QUERY_CACHE_TTL_SECONDS,
+            query_cache_path=QUERY_CACHE_PATH,
+            pool_factor=POOL_FACTOR,
+            pool_method=POOL_METHOD,
+            embedding_store_dir=EMBEDDING_STORE_DIR or None,
+            embedding_store_max_bytes=int(EMBEDDING_STORE_MAX_GB*1024**3),
+            embed_batch_min=EMBED_BATCH_MIN,
+            embed_batch_max=EMBED_BATCH_MAX,
+            embed_memory_fraction=EMBED_MEMORY_FRACTION,
+            embed_workers=EMBED_WORKERS,
+            embed_threads_per_worker=EMBED_THREADS_PER_WORKER,
+            prefetch_limit=PREFETCH_LIMIT,
+            prefetch_pooling=PREFETCH_POOLING,
+            quantization=None if QDRANT_QUANTIZATION=="none" else QDRANT_QUANTIZATION,
+            use_quantization=QDRANT_USE_QUANTIZATION,
+            oversampling=QDRANT_OVERSAMPLING,
+            rescore=QDRANT_RESCORE,
+            ingest_queue_size=INGEST_QUEUE_SIZE,
+            upsert_concurrency=UPSERT_CONCURRENCY,
+            upsert_batch_size=UPSERT_BATCH_SIZE,
+            top_k=SEARCH_TOP_K,
+            score_threshold=SEARCH_SCORE_THRESHOLD,
+            prefer_grpc=QDRANT_PREFER_GRPC,
+            grpc_port=QDRANT_GRPC_PORT,
+            async_client=QDRANT_ASYNC,
+            vector_backend=VECTOR_BACKEND,
+            local_index_dir=LOCAL_INDEX_DIR,
+            vector_client=self.vector_client()
+        )
+        print(f"[INFO] RAG singleton initialized successfully in {time.perf_counter()-started:.1f}s")
+        return rag
     
     def get_rag(self):
+        '''
+        Return the MultiModalRAG instance, building it on first call
+        '''
+        if self._rag is not None:
+            return self._rag
+        with self._lock:
+            if self._rag is None:
+                self._state="loading"
+                try:
+                    self._rag=self._build()
+                except Exception as e:
+                    self._state="failed"
+                    self._error=str(e)
+                    raise
+                #A build is ready to serve unless a warmup thread still has the warm-up pass to run
+                warmup=self._warmup_thread
+                if warmup is not None and (warmup is threading.current_thread() or warmup.ident is None):
+                    self._state="warming"
+                else:
+                    self._mark_ready()
         return self._rag
     
+    def vector_client(self):
+        '''
+        Vector store client for maintenance such as deletes, without loading ColPali.
+        The RAG adopts the same client when it is built, so a process never holds two
+        clients over the same local index. Does not wait for a build in progress.
+        '''
+        with self._client_lock:
+            if self._vector_client is None:
+                if VECTOR_BACKEND=="local":
+                    from core.local_index import LocalVectorDBClient
+                    self._vector_client=LocalVectorDBClient(LOCAL_INDEX_DIR)
+                elif VECTOR_BACKEND=="qdrant":
+                    from core.qdrant_client import VectorDBClient
+                    self._vector_client=VectorDBClient(QDRANT_URL,QDRANT_API_KEY,QDRANT_PREFER_GRPC,QDRANT_GRPC_PORT)
+                else:
+                    raise ValueError(f"Unknown vector backend '{VECTOR_BACKEND}', expected 'qdrant' or 'local'")
+            return self._vector_client
+    
+    def _indexed_collection(self):
+        #Deferred like _build; the collection only exists once a RAG has been built against this store
+        from core.qdrant_client import COLLECTION_NAME
+        client=self.vector_client()
+        exists=any(collection.name==COLLECTION_NAME for collection in client._get_collections().collections)
+        return client,COLLECTION_NAME if exists else None
+    
+    def delete_documents(self,doc_ids):
+        '''
+        Remove all indexed pages of the given documents without loading ColPali
+        '''
+        client,collection=self._indexed_collection()
+        if collection is not None:
+            client.delete_documents(list(doc_ids),collection)
+            print(f"[INFO] Deleted indexed pages of {len(doc_ids)} document(s)")
+    
+    def indexed_document_ids(self)->set:
+        '''
+        Ids of all documents that have pages in the index, without loading ColPali
+        '''
+        client,collection=self._indexed_collection()
+        return client.indexed_document_ids(collection) if collection is not None else set()
+    
+    def unowned_document_ids(self)->set:
+        '''
+        Ids of documents with pages indexed before pages recorded their owner, without loading ColPali
+        '''
+        client,collection=self._indexed_collection()
+        return client.unowned_document_ids(collection) if collection is not None else set()
+    
+    def set_document_owner(self,doc_id,owner_id):
+        '''
+        Record the owner on every indexed page of a document, without loading ColPali
+        '''
+        client,collection=self._indexed_collection()
+        if collection is not None:
+            client.set_document_owner(doc_id,owner_id,collection)
+    
+    def _mark_ready(self):
+        self._state="ready"
+        self._error=None
+        self._ready_at=time.time()
+    
+    def _warmup(self):
+        try:
+            rag=self.get_rag()
+            started=time.perf_counter()
+            rag.warmup()
+            print(f"[INFO] RAG warmup finished in {time.perf_counter()-started:.1f}s")
+            self._mark_ready()
+        except Exception as e:
+            print(f"[ERROR] RAG warmup failed: {e}")
+            with self._lock:
+                #start_warmup may try again; a pipeline that was built can serve without the warm-up pass
+                self._warmup_thread=None
+                if self._rag is None:
+                    self._state="failed"
+                    self._error=str(e)
+                else:
+                    self._mark_ready()
+    
+    def start_warmup(self,build_now:bool=False):
+        '''
+        Build and warm the RAG pipeline on a background thread.
+        With build_now the pipeline is built on the calling thread first, e.g. a server entry
+        point before it starts serving, so embedding workers fork while no other thread runs.
+        '''
+        with self._lock:
+            if self._warmup_thread is not None or self._state=="ready":
+                return
+            self._warmup_thread=threading.Thread(target=self._warmup,name="rag-warmup",daemon=True)
+        if build_now:
+            try:
+                self.get_rag()
+            except Exception as e:
+                #The warmup thread tries again
+                print(f"[ERROR] RAG build failed: {e}")
+        self._warmup_thread.start()
+    
+    def is_ready(self)->bool:
+        return self._state=="ready"
+    
+    def status(self)->dict:
+        '''
+        Current lifecycle state: idle, loading, warming, ready or failed
+        '''
+        return {"state":self._state,"error":self._error,"ready_at":self._ready_at}
+    
     def __getattr__(self, name):
-        return getattr(self._rag,name)
+        return getattr(self.get_rag(),name)
     
 rag=RAGSingleton()
\ No newline at end of file
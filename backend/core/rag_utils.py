@@ -1,18 +1,98 @@
-from typing import List,Dict,Tuple
+import asyncio
+import io
+from typing import List,Dict,Tuple,Iterable
 from PIL import Image
 from .colpali_client import ColpaliClient
-from .qdrant_client import VectorDBClient
+from .qdrant_client import VectorDBClient,AsyncVectorDBClient,RESULT_PAYLOAD_FIELDS,COLLECTION_NAME
+from .query_batcher import QueryBatcher
+from .embedding_cache import QueryEmbeddingCache
+from .pooling import TokenPooler
+from .embedding_store import EmbeddingStore,StoredImageEncoder,page_hash
+from .batch_sizer import AdaptiveBatchSizer
+from .parallel_embedding import ParallelImageEncoder
+from .ingestion import IngestionPipeline
+from .local_index import LocalVectorDBClient
+from .page_store import PageStore
 import google.generativeai as genai
 import os
 
 
 class MultiModalRAG:
-    def __init__(self,url:str,api_key:str,image_dir:str=r"..\uploads\pdf_images"):
-        self.colpali=ColpaliClient()
-        self.qdrant=VectorDBClient(url,api_key)
-        self.collection='test'
+    def __init__(self,url:str,api_key:str,image_dir:str="./uploads/pdf_images",
+                 batch_queries:bool=False,query_batch_size:int=8,query_batch_wait_ms:float=10.0,
+                 colpali_profile:str="bf16",colpali_threads:int=None,embedding_dtype:str="float32",
+                 query_cache_backend:str=None,query_cache_size:int=1024,query_cache_ttl:float=3600,
+                 query_cache_path:str="./model_cache/query_cache.sqlite",
+                 pool_factor:int=1,pool_method:str="hierarchical",
+                 embedding_store_dir:str=None,embedding_store_max_bytes:int=5*1024**3,
+                 embed_batch_min:int=1,embed_batch_max:int=32,embed_memory_fraction:float=0.5,
+                 embed_workers:int=1,embed_threads_per_worker:int=None,
+                 prefetch_limit:int=100,prefetch_pooling:str="mean",
+                 quantization:str=None,use_quantization:bool=True,oversampling:float=2.0,rescore:bool=True,
+                 ingest_queue_size:int=16,upsert_concurrency:int=4,upsert_batch_size:int=8,
+                 top_k:int=5,score_threshold:float=None,
+                 prefer_grpc:bool=False,grpc_port:int=6334,async_client:bool=False,
+                 vector_backend:str="qdrant",local_index_dir:str="./model_cache/local_index",vector_client=None):
+        self.colpali=ColpaliClient(profile=colpali_profile,num_threads=colpali_threads,embedding_dtype=embedding_dtype)
+        # Bulk ingestion can shard pages across forked worker processes.
+        # They are forked before the batcher thread starts and before any forward pass.
+        self.image_encoder=self.colpali
+        if embed_workers>1:
+            self.image_encoder=ParallelImageEncoder(self.colpali,embed_workers,embed_threads_per_worker)
+            self.image_encoder.start()
+        # Concurrent queries share one forward pass when batching is enabled
+        self.query_batcher=QueryBatcher(self.colpali,query_batch_size,query_batch_wait_ms) if batch_queries else None
+        self.query_encoder=self.query_batcher or self.colpali
+        # Repeated queries skip the forward pass entirely when the cache is enabled
+        self.query_cache=None
+        if query_cache_backend:
+            self.query_cache=QueryEmbeddingCache(
+                self.query_encoder,
+                model_key=self.colpali.embedding_key,
+                backend=query_cache_backend,
+                max_entries=query_cache_size,
+                ttl_seconds=query_cache_ttl,
+                path=query_cache_path
+            )
+            self.query_encoder=self.query_cache
+        # Page embeddings are reused from the on-disk store when the same page was embedded before
+        self.embedding_store=None
+        if embedding_store_dir:
+            self.embedding_store=EmbeddingStore(embedding_store_dir,embedding_store_max_bytes)
+            self.image_encoder=StoredImageEncoder(self.image_encoder,self.embedding_store,self.colpali.embedding_key)
+        # Shared across index_document calls so it keeps learning what this host can handle
+        self.batch_sizer=AdaptiveBatchSizer(embed_batch_min,embed_batch_max,memory_fraction=embed_memory_fraction)
+        # Optional index-time pooling of page multivectors
+        self.pooler=TokenPooler(pool_factor,pool_method) if pool_factor>1 else None
+        # Everything that changes the stored vectors, part of point ids and page fingerprints
+        self.index_revision=f"{self.colpali.model_key}:pool{pool_factor}"
+        # Qdrant, or the embedded NumPy engine for single-node deployments; an existing client is adopted as is
+        if vector_client is not None:
+            self.qdrant=vector_client
+        elif vector_backend=="local":
+            self.qdrant=LocalVectorDBClient(local_index_dir)
+        elif vector_backend=="qdrant":
+            self.qdrant=VectorDBClient(url,api_key,prefer_grpc,grpc_port)
+        else:
+            raise ValueError(f"Unknown vector backend '{vector_backend}', expected 'qdrant' or 'local'")
+        # Awaitable search/upsert over a shared pooled client; without it the async methods use a thread
+        self.async_qdrant=AsyncVectorDBClient(url,api_key,prefer_grpc,grpc_port) if async_client and vector_backend=="qdrant" else None
+        self.collection=COLLECTION_NAME
         self.image_dir=image_dir
+        # Page images packed per document, read by doc id and page number; the same store the converter writes to
+        self.page_store=PageStore.shared(image_dir)
+        # Two-stage retrieval: pooled-vector prefetch depth before MaxSim reranking (0 disables)
+        self.prefetch_limit=prefetch_limit
+        self.prefetch_pooling=prefetch_pooling
+        # Quantized copies of the vectors live in RAM, originals stay on disk for rescoring
+        self.quantization=quantization
+        self.search_options={"use_quantization":use_quantization,"oversampling":oversampling,"rescore":rescore}
+        # Default number of pages returned per query and minimum MaxSim score to keep one
+        self.top_k=top_k
+        self.score_threshold=score_threshold
         self._init_collection()
+        # Rasterization, embedding and upserting run as concurrent stages
+        self.ingestion=IngestionPipeline(self,ingest_queue_size,upsert_concurrency,upsert_batch_size)
         
         GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
         genai.configure(api_key=GEMINI_API_KEY)
@@ -20,6 +100,13 @@ class MultiModalRAG:
         
         print("[INFO] MultiModalRAG initialized successfully")
         
+    def warmup(self)->None:
+        '''
+        Run a dummy query and page through ColPali so lazy initialization happens before real traffic
+        '''
+        self.colpali.get_query_embeddings("warmup")
+        self.colpali.get_image_embeddings([Image.new("RGB",(448,448),"white")])
+        
     def _init_collection(self):
         '''
         Create collection if not present
@@ -27,32 +114,81 @@ class MultiModalRAG:
         collections=self.qdrant._get_collections().collections
         if not any(col.name == self.collection for col in collections):
             print(f"[INFO] Creating collections...")
-            self.qdrant.create_collection()
+            self.qdrant.create_collection(quantization=self.quantization)
         else:
             print(f"[INFO] Collection already exists")
+            self.qdrant.enable_quantization(self.collection,self.quantization)
+            self.qdrant.create_payload_indexes(self.collection)
+            if not self.qdrant.uses_named_vectors(self.collection):
+                print(f"[WARNING] Collection '{self.collection}' predates two-stage retrieval, searching with full MaxSim only")
             
-    def index_document(self,dataset:List[Dict]):
+    def _changed_pages(self,dataset:List[Dict])->List[Dict]:
         '''
-        Create embeddings of image and insert to the vectorDB
+        Fingerprint each page and keep only those that are new or differ from what is indexed.
+        The owner is part of the fingerprint so pages indexed before ownership was recorded get rewritten.
+        '''
+        for item in dataset:
+            item["fingerprint"]=page_hash(item["image"],f"{self.index_revision}:{item.get('owner_id')}")
+        point_ids=[self.qdrant.point_id(item["doc_id"],item["page_number"],self.index_revision) for item in dataset]
+        indexed=self.qdrant.get_fingerprints(point_ids,self.collection)
+        return [item for item,point_id in zip(dataset,point_ids) if indexed.get(point_id)!=item["fingerprint"]]
+    
+    def index_document(self,dataset:Iterable[Dict])->int:
+        '''
+        Create embeddings of image and insert to the vectorDB.
+        The dataset may be a generator; pages are rasterized, embedded and upserted as a stream.
+        Pages whose content is already indexed under the current revision are skipped.
+        Returns the number of pages processed.
         '''
         try:
-            print("[INFO] Preparing point structures for Qdrant...")
-            points=self.qdrant.create_points(self.colpali,dataset)
+            stats=self.ingestion.run(dataset)
             
-            print("[INFO] Inserting data into Qdrant...")
-            self.qdrant.insert_data(points,dataset)
+            # Drop pages removed from a revised document and points from older revisions
+            for doc_id,page_count in stats["page_counts"].items():
+                self.qdrant.delete_stale_pages(doc_id,page_count,self.index_revision,self.collection)
+                self.page_store.retain(doc_id,page_count)
+            return stats["pages"]
         except Exception as e:
             print(f"Cannot add to vector DB:{e}")   
+            return 0
           
-    def query(self,query_text:str)->List[Dict]:
+    def delete_documents(self,doc_ids:List[int])->None:
         '''
-        Creates query embeddings and search relevent images based on user query
+        Remove all indexed pages of the given documents
+        '''
+        self.qdrant.delete_documents(list(doc_ids),self.collection)
+        print(f"[INFO] Deleted indexed pages of {len(doc_ids)} document(s)")
+    
+    def indexed_document_ids(self)->set:
+        '''
+        Ids of all documents that have pages in the index
+        '''
+        return self.qdrant.indexed_document_ids(self.collection)
+          
+    def query(self,query_text:str,owner_id=None,document_ids:List[int]=None,top_k:int=None,
+              score_threshold:float=None,payload_fields:List[str]=None)->List[Dict]:
+        '''
+        Creates query embeddings and search relevent images based on user query.
+        With owner_id only that user's pages are searched, optionally limited to document_ids.
+        Returns at most top_k points scoring at least score_threshold (the configured defaults
+        when not given), carrying only payload_fields and no vectors.
+        Runs on the synchronous client; coroutine callers use aquery().
         '''
         print(f"[INFO] Generating embedding for query: '{query_text}'")
-        query_embeddings=self.colpali.get_query_embeddings(query_text)
+        query_embeddings=self.query_encoder.get_query_embeddings(query_text)
         
         print("[INFO] Performing vector search in Qdrant...")
-        response=self.qdrant.search(user_query=query_embeddings)
+        response=self.qdrant.search(
+            user_query=query_embeddings,
+            prefetch_limit=self.prefetch_limit,
+            owner_id=owner_id,
+            document_ids=document_ids,
+            limit=top_k or self.top_k,
+            score_threshold=self.score_threshold if score_threshold is None else score_threshold,
+            with_payload=payload_fields or RESULT_PAYLOAD_FIELDS,
+            with_vectors=False,
+            **self.search_options
+        )
         
         # Extract points from QueryResponse object
         results = response.points if hasattr(response, 'points') else []
@@ -60,6 +196,69 @@ class MultiModalRAG:
         
         return results
     
+    def query_batch(self,queries:List[str],owner_id=None,document_ids:List[int]=None,top_k:int=None,
+                    score_threshold:float=None,payload_fields:List[str]=None)->List[List]:
+        '''
+        Run several queries with one Colpali forward pass and one Qdrant round trip.
+        Takes the same options as query() and returns the matching points of each query, in order.
+        '''
+        if not queries:
+            return []
+        print(f"[INFO] Generating embeddings for {len(queries)} queries")
+        query_embeddings=self.query_encoder.get_query_embeddings_batch(queries)
+        
+        print("[INFO] Performing batched vector search in Qdrant...")
+        responses=self.qdrant.search_batch(
+            query_embeddings,
+            self.collection,
+            prefetch_limit=self.prefetch_limit,
+            owner_id=owner_id,
+            document_ids=document_ids,
+            limit=top_k or self.top_k,
+            score_threshold=self.score_threshold if score_threshold is None else score_threshold,
+            with_payload=payload_fields or RESULT_PAYLOAD_FIELDS,
+            with_vectors=False,
+            **self.search_options
+        )
+        results=[response.points if hasattr(response,'points') else [] for response in responses]
+        print(f"[INFO] Found {sum(len(points) for points in results)} matching results for {len(queries)} queries")
+        return results
+    
+    async def aquery(self,query_text:str,owner_id=None,document_ids:List[int]=None,top_k:int=None,
+                     score_threshold:float=None,payload_fields:List[str]=None)->List:
+        '''
+        Awaitable query(). The query embedding runs in a worker thread and the search on the
+        async Qdrant client, so the calling event loop is not blocked.
+        '''
+        if self.async_qdrant is None:
+            return await asyncio.to_thread(self.query,query_text,owner_id,document_ids,top_k,score_threshold,payload_fields)
+        print(f"[INFO] Generating embedding for query: '{query_text}'")
+        query_embeddings=await asyncio.to_thread(self.query_encoder.get_query_embeddings,query_text)
+        print(f"[INFO] Performing vector search in Qdrant over {self.async_qdrant.transport}...")
+        response=await self.async_qdrant.search(
+            query_embeddings,
+            self.collection,
+            prefetch_limit=self.prefetch_limit,
+            owner_id=owner_id,
+            document_ids=document_ids,
+            limit=top_k or self.top_k,
+            score_threshold=self.score_threshold if score_threshold is None else score_threshold,
+            with_payload=payload_fields or RESULT_PAYLOAD_FIELDS,
+            with_vectors=False,
+            **self.search_options
+        )
+        results=response.points if hasattr(response,'points') else []
+        print(f"[INFO] Found {len(results)} matching results")
+        return results
+    
+    async def aupsert(self,points:List[Dict],wait:bool=True)->None:
+        '''
+        Awaitable upsert of points built by create_points
+        '''
+        if self.async_qdrant is None:
+            return await asyncio.to_thread(self.qdrant.upsert_batch,points,self.collection,wait)
+        await self.async_qdrant.upsert_batch(points,self.collection,wait)
+    
     def get_result_images(self,search_result:List,dataset:List[Dict]=None)->List[Tuple[Image.Image,Dict]]:        
         '''
         Extract information from the retrived point
@@ -77,14 +276,13 @@ class MultiModalRAG:
             page_num=payload.get("page_num")
             filename=payload.get("source")
             
-            # Construct image path from metadata
-            pdf_name_without_ext = filename.replace('.pdf', '')
-            image_filename = f"doc_{doc_id}_page_{page_num}_{pdf_name_without_ext}.png"
-            image_path = os.path.join(self.image_dir, image_filename)  # Use your actual image directory
-            
             try:
-                # Load image from disk
-                image = Image.open(image_path)
+                # Exact lookup by document and page in the memory-mapped page store
+                data = self.page_store.get(doc_id, page_num)
+                if data is None:
+                    print(f"[WARNING] Page image not found: document {doc_id}, page {page_num}")
+                    continue
+                image = Image.open(io.BytesIO(data))
                 metadata = {
                     'doc_id': doc_id,
                     'page_number': page_num,
@@ -93,23 +291,19 @@ class MultiModalRAG:
                 }
                 retrieved_images.append((image, metadata))
                 print(f"[INFO] Retrieved image: {filename}, page {page_num}, score: {score:.3f}")
-            except FileNotFoundError:
-                print(f"[WARNING] Image file not found: {image_path}")
             except Exception as e:
-                print(f"[ERROR] Failed to load image {image_path}: {e}")
+                print(f"[ERROR] Failed to load page {page_num} of document {doc_id}: {e}")
         
         return retrieved_images
     
-    def search_and_retrieve(self, query_text: str, top_k: int = 5) -> List[Tuple[Image.Image, Dict]]:
+    def search_and_retrieve(self, query_text: str, top_k: int = None, owner_id=None,
+                            document_ids: List[int] = None, score_threshold: float = None) -> List[Tuple[Image.Image, Dict]]:
         """
         Search for relevant pages and retrieve their images
         """
-        # Get search results
-        search_results = self.query(query_text)
-        
-        # Limit results if needed
-        if top_k and len(search_results) > top_k:
-            search_results = search_results[:top_k]
+        # Get search results, Qdrant applies the top_k limit and score threshold
+        search_results = self.query(query_text, owner_id=owner_id, document_ids=document_ids,
+                                    top_k=top_k, score_threshold=score_threshold)
         
         # Retrieve corresponding images
         retrieved_images = self.get_result_images(search_results)
@@ -144,14 +338,16 @@ class MultiModalRAG:
         else:
             return {"sufficient": False, "confidence": "low", "reason": "Low relevance scores"}
         
-    def generate_result(self, query_text: str) -> Dict:
+    def generate_result(self, query_text: str, owner_id=None, document_ids: List[int] = None,
+                        top_k: int = None, score_threshold: float = None) -> Dict:
         """
         Complete RAG workflow: search, retrieve images, and get response from Gemini
         Returns structured result with metadata
         """
         try:
             # Search and retrieve images
-            retrieved_images = self.search_and_retrieve(query_text)
+            retrieved_images = self.search_and_retrieve(query_text, top_k=top_k, owner_id=owner_id,
+                                                        document_ids=document_ids, score_threshold=score_threshold)
             
             # Evaluate retrieval quality
             evaluation = self.evaluate_retrieval_quality(retrieved_images, query_text)
@@ -1,12 +1,55 @@
+import multiprocessing
 import os
-from typing import List,Dict,Union
-from pdf2image import convert_from_path
+from collections import deque
+from concurrent.futures import Future,ProcessPoolExecutor
+from typing import List,Dict,Tuple,Union,Iterator
+from PIL import Image
+from pdf2image import convert_from_path,pdfinfo_from_path
+from .page_store import PageStore
+from .page_writer import PageWriter
+
+#ColPali resizes every page to a square 448x448 input
+DEFAULT_EMBED_SIZE=448
+
+
+def _rasterize_window(settings:Dict,file_path:str,doc_id:int,first_page:int,last_page:int,page_count:int=None)->List[Dict]:
+    #Runs in a worker process; pages are encoded there so encoding is parallel too, the parent stores them
+    records=PdfConverter(**settings,background_writes=False)._convert_window(file_path,doc_id,first_page,last_page,
+                                                                             encode_only=True,page_count=page_count)
+    for record in records:
+        #Futures do not pickle, send the encoded page instead
+        record["saved"]=record["saved"].result()
+    return records
+
+
+def _resolved(function,*args)->Future:
+    #Run a call on this thread and wrap its outcome like a writer Future
+    future=Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
 
 class PdfConverter:
     '''
     Converts PDF file or PDF files from folder to images.
+    
+    Pages are rasterized at dpi and saved at that resolution for display and Gemini.
+    The in-memory copy handed to the embedding path is downsampled once to
+    embed_size (the model input size), so full-resolution bitmaps are not kept.
+    Poppler is called page_window pages at a time, so at most one window of
+    full-resolution bitmaps is decoded at once (0 converts the whole file in one call).
+    With workers > 1, windows of all PDFs are rasterized across a process pool; pages
+    are still yielded in file and page order and doc ids are assigned before fan-out.
+    Page images are encoded with image_format (png, jpeg or webp) on a background writer
+    thread into the PageStore under image_dir, keyed by doc id and page number; each
+    record carries a "saved" Future that resolves once its page is readable from the store.
     '''
-    def __init__(self,image_dir=None):
+    def __init__(self,image_dir=None,dpi:int=200,embed_size:int=DEFAULT_EMBED_SIZE,poppler_path:str=None,
+                 page_window:int=8,workers:int=1,image_format:str="png",image_quality:int=90,
+                 png_compress_level:int=6,background_writes:bool=True):
         if image_dir is None:
             # Create pdf_images folder inside uploads directory
             uploads_dir = os.path.join(os.getcwd(), 'uploads')
@@ -16,60 +59,246 @@ class PdfConverter:
         os.makedirs(self.saved_images_dir,exist_ok=True)
         os.environ["TOKENIZERS_PARALLELISM"]="false"
         self._doc_counter=1
+        self.dpi=dpi
+        self.embed_size=embed_size
+        self.poppler_path=poppler_path
+        self.page_window=page_window
+        self.workers=max(1,workers)
+        self._executor=None
+        self.image_format=image_format
+        self.image_quality=image_quality
+        self.png_compress_level=png_compress_level
+        self.background_writes=background_writes
+        self.page_store=PageStore.shared(self.saved_images_dir)
+        self.writer=PageWriter(self.page_store,image_format,image_quality,png_compress_level,max_pending=max(8,page_window))
+    
+    def _embedding_copy(self,image:Image.Image)->Image.Image:
+        '''
+        Downsample a rasterized page to the model input size, once
+        '''
+        if not self.embed_size:
+            return image
+        return image.resize((self.embed_size,self.embed_size),Image.Resampling.BICUBIC)
         
-    def pdf_to_image(self,file_path:str)->List[Dict]:
+    def _page_windows(self,file_path:str)->Tuple[int,List[tuple]]:
         '''
-        Convert a PDF file to images.
+        Page count of the PDF and the (first_page, last_page) ranges of page_window pages covering it.
+        The count is None when the whole file is converted in one call.
+        '''
+        if not self.page_window:
+            return None,[(None,None)]
+        page_count=pdfinfo_from_path(file_path,poppler_path=self.poppler_path)["Pages"]
+        return page_count,[(first_page,min(page_count,first_page+self.page_window-1))
+                           for first_page in range(1,page_count+1,self.page_window)]
+    
+    def _page_record(self,image:Image.Image,doc_id:int,pdf_name:str,page_number:int,encode_only:bool=False,
+                     page_count:int=None)->Dict:
+        '''
+        Queue a rasterized page for saving and return its record with the downsampled embedding copy
+        '''
+        #Poppler already returns RGB pages; convert only when it did not, and only once
+        if image.mode!="RGB":
+            image=image.convert('RGB')
+        if encode_only:
+            saved=_resolved(self.writer.encode,image)
+        elif self.background_writes:
+            saved=self.writer.submit(image,doc_id,page_number)
+        else:
+            saved=_resolved(self.writer.write,image,doc_id,page_number)
+        return {
+            "doc_id":doc_id,
+            "filename":pdf_name,
+            "page_number":page_number,
+            #Pages in the document, even when a window of it failed to convert
+            "page_count":page_count,
+            "image":self._embedding_copy(image),
+            "saved":saved
+        }
+    
+    def _convert_window(self,file_path:str,doc_id:int,first_page:int=None,last_page:int=None,
+                        encode_only:bool=False,page_count:int=None)->List[Dict]:
+        '''
+        Rasterize and save one page window of a PDF
+        '''
+        images=convert_from_path(file_path,dpi=self.dpi,first_page=first_page,last_page=last_page,
+                                 poppler_path=self.poppler_path)
+        return list(self._window_records(images,doc_id,os.path.basename(file_path),first_page,encode_only,page_count))
+    
+    def _window_records(self,images:List,doc_id:int,pdf_name:str,first_page:int=None,
+                        encode_only:bool=False,page_count:int=None)->Iterator[Dict]:
+        '''
+        Yield the page records of one rasterized window in page order
+        '''
+        if page_count is None and first_page is None:
+            page_count=len(images)
+        for i in range(len(images)):
+            #Drop the full-resolution page as soon as it has been saved and downsampled
+            image=images[i]
+            images[i]=None
+            yield self._page_record(image,doc_id,pdf_name,(first_page or 1)+i,encode_only,page_count)
+    
+    def start(self)->None:
+        '''
+        Fork the rasterization workers now. Servers call this at startup, before the model
+        loads or any thread runs, since a fork inherits whatever locks other threads hold;
+        otherwise the pool is forked on first use.
+        '''
+        if self.workers>1 and "fork" in multiprocessing.get_all_start_methods():
+            #With fork, the first task launches every worker of the pool
+            self._get_executor().submit(os.getpid).result()
+    
+    def _get_executor(self)->ProcessPoolExecutor:
+        if self._executor is None:
+            #Fork like the embedding workers: spawn would re-import the Flask app in every worker
+            self._executor=ProcessPoolExecutor(max_workers=self.workers,mp_context=multiprocessing.get_context("fork"))
+            print(f"[INFO] Started {self.workers} rasterization workers")
+        return self._executor
+    
+    def iter_convert_many(self,file_paths:List[str],doc_ids:List[int]=None)->Iterator[Dict]:
+        '''
+        Rasterize several PDFs and yield their page records in file order, then page order.
+        
+        Args:
+            file_paths (List[str]): paths of the pdf files.
+            doc_ids (List[int]): stable document id per file; missing ids come from the per-process counter,
+                assigned in file order before any conversion starts.
+        
+        Yields:
+            Dict: page records, as from iter_pdf_pages.
+        '''
+        doc_ids=list(doc_ids or [])+[None]*(len(file_paths)-len(doc_ids or []))
+        for i,doc_id in enumerate(doc_ids):
+            if doc_id is None:
+                doc_ids[i]=self._doc_counter
+                self._doc_counter+=1
+        if self.workers==1 or "fork" not in multiprocessing.get_all_start_methods():
+            for file_path,doc_id in zip(file_paths,doc_ids):
+                yield from self.iter_pdf_pages(file_path,doc_id)
+            return
+        
+        settings={"image_dir":self.saved_images_dir,"dpi":self.dpi,"embed_size":self.embed_size,
+                  "poppler_path":self.poppler_path,"page_window":self.page_window,"image_format":self.image_format,
+                  "image_quality":self.image_quality,"png_compress_level":self.png_compress_level}
+        tasks=[]
+        for file_path,doc_id in zip(file_paths,doc_ids):
+            try:
+                page_count,windows=self._page_windows(file_path)
+            except Exception as e:
+                print(f"[ERROR] Failed to read {os.path.basename(file_path)}: {e}")
+                continue
+            tasks.extend((file_path,doc_id,first_page,last_page,page_count) for first_page,last_page in windows)
+        
+        #Keep a couple of windows per worker in flight and yield them in submission order
+        executor=self._get_executor()
+        pending=deque()
+        tasks=iter(tasks)
+        while True:
+            while len(pending)<2*self.workers:
+                task=next(tasks,None)
+                if task is None:
+                    break
+                pending.append((task,executor.submit(_rasterize_window,settings,*task)))
+            if not pending:
+                break
+            (file_path,doc_id,first_page,last_page,_),future=pending.popleft()
+            try:
+                records=future.result()
+            except Exception as e:
+                print(f"[ERROR] Failed to convert {os.path.basename(file_path)} (pages {first_page or 1}-{last_page or 'end'}): {e}")
+                continue
+            for record in records:
+                record["saved"]=_resolved(self.writer.store_encoded,doc_id,record["page_number"],record["saved"])
+                yield record
+    
+    def close(self)->None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False,cancel_futures=True)
+            self._executor=None
+        self.writer.close()
+    
+    @staticmethod
+    def wait_saved(records:List[Dict])->List[Dict]:
+        '''
+        Block until the page images of records are on disk and return the records that were saved
+        '''
+        saved=[]
+        for record in records:
+            try:
+                record["saved"].result()
+                saved.append(record)
+            except Exception as e:
+                print(f"[ERROR] Failed to save page {record['page_number']} of document {record['doc_id']}: {e}")
+        return saved
+    
+    def iter_pdf_pages(self,file_path:str,doc_id:int=None)->Iterator[Dict]:
+        '''
+        Rasterize a PDF window by window and yield page records as they are ready.
         
         Args:
             file_path(str): path for the pdf file.
+            doc_id(int): stable document id, e.g. the database Document.id. Defaults to a per-process counter.
             
-        Returns: 
-            List[Dict]: List of dictionary with document id, page number, image and filename.
+        Yields:
+            Dict: document id, page number, image and filename of each page, in page order.
+            A window that fails to convert is logged and skipped, as in iter_convert_many.
         '''
         pdf_name=os.path.basename(file_path)
+        if doc_id is None:
+            doc_id=self._doc_counter
+            self._doc_counter+=1
         try:
-            images=convert_from_path(file_path,poppler_path=r"C:\Program Files\poppler-24.08.0\Library\bin") #change to pdf_path
+            page_count,windows=self._page_windows(file_path)
         except Exception as e:
-            print(f"[ERROR] Failed to convert {pdf_name}: {e}")
-            return []
+            print(f"[ERROR] Failed to read {pdf_name}: {e}")
+            return
+        for first_page,last_page in windows:
+            try:
+                images=convert_from_path(file_path,dpi=self.dpi,first_page=first_page,last_page=last_page,
+                                         poppler_path=self.poppler_path)
+            except Exception as e:
+                print(f"[ERROR] Failed to convert {pdf_name} (pages {first_page or 1}-{last_page or 'end'}): {e}")
+                continue
+            yield from self._window_records(images,doc_id,pdf_name,first_page,page_count=page_count)
+    
+    def pdf_to_image(self,file_path:str,doc_id:int=None)->List[Dict]:
+        '''
+        Convert a PDF file to images.
         
-        results=[]
-        for page_num,image in enumerate(images):
-            image_filename = f"doc_{self._doc_counter}_page_{page_num+1}_{pdf_name.replace('.pdf', '')}.png"
-            image_path = os.path.join(self.saved_images_dir, image_filename)
-            image.convert('RGB').save(image_path)
+        Args:
+            file_path(str): path for the pdf file.
+            doc_id(int): stable document id, e.g. the database Document.id. Defaults to a per-process counter.
             
-            results.append({
-                "doc_id":self._doc_counter,
-                "filename":pdf_name,
-                "page_number":page_num+1,
-                "image_path":image_path,
-                "image":image.convert('RGB')
-            })
-        self._doc_counter+=1
-        return results
+        Returns: 
+            List[Dict]: List of dictionary with document id, page number, image and filename.
+        '''
+        return self.wait_saved(list(self.iter_pdf_pages(file_path,doc_id)))
     
-    def convert(self,input_path:Union[str,List[str]])->List[Dict]:
+    def iter_convert(self,input_path:str,doc_id:int=None)->Iterator[Dict]:
+        '''
+        Streaming convert(): yields page records of a PDF file or a folder of PDFs as they are rasterized.
+        
+        Args:
+            input_path (str): Path to a PDF file or folder.
+            doc_id (int): Stable document id for a single PDF file.
+        '''
+        if os.path.isdir(input_path):
+            #Sorted so counter-assigned doc ids do not depend on directory listing order
+            pdf_files=sorted(f for f in os.listdir(input_path) if f.lower().endswith(".pdf"))
+            yield from self.iter_convert_many([os.path.join(input_path,pdf_file) for pdf_file in pdf_files])
+        elif os.path.isfile(input_path) and input_path.lower().endswith(".pdf"):
+            yield from self.iter_convert_many([input_path],[doc_id])
+        else:
+            raise ValueError(f"[ERROR] Invalid input path: {input_path}")
+    
+    def convert(self,input_path:Union[str,List[str]],doc_id:int=None)->List[Dict]:
         '''
         Converts a folder of PDF or a single PDF file inot images.
         
         Args:
             input_path (str or List[str]): Path to a PDF file or folder.
+            doc_id (int): Stable document id for a single PDF file.
         
         Returns:
             List[Dict]: List of image dictionary with metadata
         '''
-        all_images=[]
-        if os.path.isdir(input_path):
-            pdf_files=[f for f in os.listdir(input_path)if f.lower().endswith(".pdf")]
-            #pdf_files.sort()
-            for pdf_file in pdf_files:
-                pdf_path=os.path.join(input_path,pdf_file)
-                images=self.pdf_to_image(pdf_path)
-                all_images.extend(images)
-        elif os.path.isfile(input_path) and input_path.lower().endswith(".pdf"):
-            all_images=self.pdf_to_image(input_path)
-        else:
-            raise ValueError(f"[ERROR] Invalid input path: {input_path}")
-        return all_images
+        return self.wait_saved(list(self.iter_convert(input_path,doc_id)))
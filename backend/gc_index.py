@@ -0,0 +1,35 @@
+import argparse
+from app import app, db
+from model.document import Document
+from services.query_service import collect_garbage, backfill_owners
+
+def gc_index(dry_run: bool = False):
+    """
+    Removes indexed pages and saved page images that belong to documents
+    no longer present in the documents table, e.g. deleted before cascading
+    cleanup existed or left behind by a failed upload. Pages that remaining
+    duplicate uploads still link to are kept. Pages indexed before pages
+    recorded their owner get the owner of their document, so scoped searches
+    find them again.
+    """
+    with app.app_context():
+        print("--- Index Garbage Collection Started ---")
+        rows = db.session.query(Document.id, Document.source_document_id, Document.owner_id).all()
+        print(f"{len(rows)} documents in the database.")
+
+        # Duplicates share their owner with the document whose pages they reuse
+        owners = {source_document_id or document_id: owner_id for document_id, source_document_id, owner_id in rows}
+        orphans = collect_garbage({document_id for document_id, _, _ in rows} | set(owners), dry_run=dry_run)
+        action = "Would remove" if dry_run else "Removed"
+        print(f"{action} indexed pages of {len(orphans['indexed'])} documents: {orphans['indexed']}")
+        print(f"{action} page images of {len(orphans['page_images'])} documents: {orphans['page_images']}")
+        backfilled = backfill_owners(owners, dry_run=dry_run)
+        action = "Would set" if dry_run else "Set"
+        print(f"{action} the owner on indexed pages of {len(backfilled)} documents: {backfilled}")
+        print("--- Index Garbage Collection Complete ---")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reconcile the vector index and page images with the documents table and backfill page owners")
+    parser.add_argument("--dry-run", action="store_true", help="only report orphaned documents")
+    args = parser.parse_args()
+    gc_index(dry_run=args.dry_run)
@@ -1,5 +1,5 @@
 from config.database import db
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, or_
 from datetime import datetime
 
 class Document(db.Model):
@@ -9,8 +9,34 @@ class Document(db.Model):
     filepath = Column(String(500), nullable=False, unique=True)
     upload_date = Column(DateTime, default=datetime.utcnow)
     file_size_bytes = Column(Integer, nullable=False)
+    # SHA-256 of the uploaded file, used to detect re-uploads of already indexed content
+    content_hash = Column(String(64), index=True)
+    # Document whose page images and vectors this one reuses; not a foreign key so it survives that row's deletion
+    source_document_id = Column(Integer, index=True)
     owner_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     owner = db.relationship('User', backref=db.backref('documents', lazy=True))
 
+    @property
+    def index_document_id(self):
+        """Id the document's pages are stored and searched under"""
+        return self.source_document_id or self.id
+
+    def shares_index(self):
+        """Whether another document still uses this document's indexed pages"""
+        index_id = self.index_document_id
+        return Document.query.filter(
+            Document.id != self.id,
+            or_(Document.id == index_id, Document.source_document_id == index_id)
+        ).count() > 0
+
+    @staticmethod
+    def index_ids(document_ids, owner_id):
+        """Map the owner's document ids to the ids their pages are indexed under; ids of other owners or unknown ids are dropped"""
+        if not document_ids:
+            return document_ids
+        documents = Document.query.filter(Document.id.in_(document_ids), Document.owner_id == owner_id).all()
+        mapping = {document.id: document.index_document_id for document in documents}
+        return list(dict.fromkeys(mapping[document_id] for document_id in document_ids if document_id in mapping))
+
     def __repr__(self):
-        return f"<Document {self.id}: {self.filename}>"
\ No newline at end of file
+        return f"<Document {self.id}: {self.filename}>"
@@ -0,0 +1,59 @@
+import argparse
+import os
+import re
+from app import app, db
+from config.settings import PAGE_STORE_DIR
+from core.page_store import PageStore
+from model.document import Document
+
+# Loose page images saved before the page store existed: doc_<doc_id>_page_<page>_<pdf name>.<ext>
+LOOSE_PAGE_PATTERN = re.compile(r"^doc_(\d+)_page_(\d+)_(.+)\.(png|jpg|webp)$")
+CODECS = {"png": "png", "jpg": "jpeg", "webp": "webp"}
+
+def pack_pages(image_dir: str = PAGE_STORE_DIR, keep: bool = False):
+    """
+    Moves loose page images into the packed page store, one file per document.
+    Images are only packed when their id is in the documents table and their
+    PDF name matches that document's filename, since images saved before
+    deterministic ids used a per-process counter that can collide with other
+    documents; the rest are left in place. Pages the store already holds are
+    newer and are left as they are; the loose copies are removed unless keep is set.
+    """
+    with app.app_context():
+        print("--- Page Packing Started ---")
+        # Loose names carry the uploaded file name without its .pdf extension
+        names = {document_id: filename.replace('.pdf', '')
+                 for document_id, filename in db.session.query(Document.id, Document.filename).all()}
+        print(f"{len(names)} documents in the database.")
+
+    store = PageStore(image_dir)
+    packed, skipped, unmatched, documents = 0, 0, 0, set()
+    for name in sorted(os.listdir(image_dir)):
+        match = LOOSE_PAGE_PATTERN.match(name)
+        if not match:
+            continue
+        doc_id, page_number, pdf_name, extension = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        if names.get(doc_id) != pdf_name:
+            unmatched += 1
+            continue
+        path = os.path.join(image_dir, name)
+        if store.get(doc_id, page_number) is None:
+            with open(path, "rb") as f:
+                store.put(doc_id, page_number, f.read(), CODECS[extension])
+            packed += 1
+            documents.add(doc_id)
+        else:
+            skipped += 1
+        if not keep:
+            os.remove(path)
+    store.close()
+    print(f"Packed {packed} page images of {len(documents)} documents, {skipped} already in the store.")
+    print(f"Left {unmatched} page images in place whose id and PDF name match no document.")
+    print("--- Page Packing Complete ---")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Move loose page images into the packed page store")
+    parser.add_argument("--image-dir", default=PAGE_STORE_DIR, help="folder holding the loose images and the store")
+    parser.add_argument("--keep", action="store_true", help="leave the loose image files in place")
+    args = parser.parse_args()
+    pack_pages(args.image_dir, keep=args.keep)
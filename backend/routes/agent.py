@@ -1,10 +1,33 @@
 from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from services.query_service import process_query
+from config.settings import SEARCH_MAX_TOP_K
+from model.document import Document
 
 agent_bp = Blueprint('agent', __name__)
 
 @agent_bp.route("/query/", methods=['POST'])
+@jwt_required()
 async def query():
+    owner_id = int(get_jwt_identity())
     data = request.get_json()
     query_text = data.get('query', '')
-    return await process_query(query_text)
\ No newline at end of file
+    try:
+        top_k = int(data['top_k']) if data.get('top_k') is not None else None
+        score_threshold = float(data['score_threshold']) if data.get('score_threshold') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k must be an integer and score_threshold a number"}), 400
+    if top_k is not None and not 1 <= top_k <= SEARCH_MAX_TOP_K:
+        return jsonify({"error": f"top_k must be between 1 and {SEARCH_MAX_TOP_K}"}), 400
+    # Duplicate uploads are searched through the document whose pages they reuse
+    document_ids = Document.index_ids(data.get('document_ids'), owner_id)
+    if data.get('document_ids') and not document_ids:
+        return jsonify({"error": "Document not found"}), 404
+    # Only the caller's own documents are searched
+    return await process_query(
+        query_text,
+        owner_id=owner_id,
+        document_ids=document_ids,
+        top_k=top_k,
+        score_threshold=score_threshold
+    )
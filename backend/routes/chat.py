@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from model.user import User
 from model.chat import ChatSession, ChatMessage
+from model.document import Document
 from config.database import db
 from services.query_service import process_query
 import asyncio
@@ -177,6 +178,11 @@ def send_chat_message(session_id):
     if not content:
         return jsonify({"error": "Message content is required"}), 400
 
+    # Duplicate uploads are searched through the document whose pages they reuse
+    document_ids = Document.index_ids(data.get("document_ids"), user.id)
+    if data.get("document_ids") and not document_ids:
+        return jsonify({"error": "Document not found"}), 404
+
     try:
         # Save user message
         user_message = ChatMessage(
@@ -188,7 +194,8 @@ def send_chat_message(session_id):
         db.session.commit()
 
         # Get agent response
-        agent_response = asyncio.run(process_query(content))
+        agent_response = asyncio.run(process_query(content, owner_id=user.id,
+                                                   document_ids=document_ids))
         agent_content = agent_response.get("response", "Sorry, I couldn't process your request.")
 
         # Save agent response
@@ -2,15 +2,44 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
 import os
+import uuid
+from datetime import datetime
 from model.document import Document
 from model.user import User
 from config.database import db
 from config.settings import Config
-from utils.file_utils import allowed_file
-from services.query_service import process_documents
+from utils.file_utils import allowed_file, save_with_hash
+from services.query_service import process_documents, remove_document
 
 documents_bp = Blueprint('documents', __name__)
 
+def _document_response(document, msg, **extra):
+    return {
+        "msg": msg,
+        "id": document.id,
+        "filename": document.filename,
+        "filepath": document.filepath,
+        "upload_date": document.upload_date.isoformat(),
+        "file_size_bytes": document.file_size_bytes,
+        **extra
+    }
+
+async def _detach_dependents(document):
+    """
+    Give documents linked to this document's pages their own index before its content
+    changes: the oldest one is indexed from its own file and the others link to it.
+    """
+    dependents = Document.query.filter_by(source_document_id=document.id).order_by(Document.id).all()
+    if not dependents:
+        return
+    heir = dependents[0]
+    # Index first so the dependents never point at pages that do not exist yet
+    await process_documents([heir.filepath], [heir.id], owner_id=heir.owner_id)
+    heir.source_document_id = None
+    for dependent in dependents[1:]:
+        dependent.source_document_id = heir.id
+    db.session.commit()
+
 @documents_bp.route("/documents", methods=["POST"])
 @jwt_required()
 async def upload_document():
@@ -30,53 +59,97 @@ async def upload_document():
         filename = secure_filename(file.filename)
         filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
 
+        # Re-uploading a file with the same name is treated as a new revision of that document
+        existing_document = Document.query.filter_by(filepath=filepath).first()
+        if existing_document and existing_document.owner_id != user.id:
+            return jsonify({"error": "A document with this filename already exists"}), 409
+
+        # Saved beside the final path and hashed on the way, so an unchanged re-upload never touches the stored file.
+        # Unique per request, concurrent uploads of the same name must not write into one another's file.
+        upload_path = f"{filepath}.{uuid.uuid4().hex}.upload"
         try:
-            file.save(filepath)
+            file_size_bytes, content_hash = save_with_hash(file, upload_path)
             
-            if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
+            if file_size_bytes == 0:
                 raise Exception("File was not saved properly or is empty")
 
-            file_size_bytes = os.path.getsize(filepath)
-            
-            new_document = Document(
-                filename=filename,
-                filepath=filepath,
-                file_size_bytes=file_size_bytes,
-                owner_id=user.id
-            )
-            db.session.add(new_document)
+            if existing_document and existing_document.content_hash == content_hash:
+                # Same content under the same name: its pages are already indexed
+                os.remove(upload_path)
+                existing_document.upload_date = datetime.utcnow()
+                db.session.commit()
+                return jsonify(_document_response(existing_document, "File unchanged, already processed",
+                                                  processing_result={"status": "unchanged"})), 200
+
+            # Same content already indexed for another of the user's documents: reuse its pages and vectors.
+            # Matches stay within one owner because indexed pages are partitioned by owner.
+            duplicate = Document.query.filter(
+                Document.owner_id == user.id,
+                Document.content_hash == content_hash,
+                Document.filepath != filepath
+            ).order_by(Document.id).first()
+
+            # A revised document that now links elsewhere no longer needs the pages indexed under its own id
+            drop_own_pages = bool(existing_document and duplicate and existing_document.source_document_id is None)
+            if existing_document:
+                # The content changes, so documents reusing its pages need their own first
+                await _detach_dependents(existing_document)
+            os.replace(upload_path, filepath)
+
+            if existing_document:
+                new_document = existing_document
+                new_document.file_size_bytes = file_size_bytes
+                new_document.upload_date = datetime.utcnow()
+            else:
+                new_document = Document(
+                    filename=filename,
+                    filepath=filepath,
+                    file_size_bytes=file_size_bytes,
+                    owner_id=user.id
+                )
+                db.session.add(new_document)
+            new_document.content_hash = content_hash
+            new_document.source_document_id = duplicate.index_document_id if duplicate else None
             db.session.commit()
+
+            if duplicate:
+                if drop_own_pages:
+                    try:
+                        remove_document(new_document.id)
+                    except Exception as cleanup_error:
+                        print(f"Error removing previous pages of document {filename}: {cleanup_error}")
+                return jsonify(_document_response(new_document, "File uploaded, content already processed",
+                                                  processing_result={"status": "linked",
+                                                                     "source_document_id": new_document.source_document_id})), 201
             
             try:
                 files_list = [filepath]
-                processing_result = await process_documents(files_list)
+                processing_result = await process_documents(files_list, [new_document.id], owner_id=new_document.owner_id)
+                if not processing_result.get("pages"):
+                    # Nothing was indexed; forget the hash so uploading the same file again retries
+                    new_document.content_hash = None
+                    db.session.commit()
                 
-                return jsonify({
-                    "msg": "File uploaded and processed successfully",
-                    "id": new_document.id,
-                    "filename": new_document.filename,
-                    "filepath": new_document.filepath,
-                    "upload_date": new_document.upload_date.isoformat(),
-                    "file_size_bytes": new_document.file_size_bytes,
-                    "processing_result": processing_result
-                }), 201
+                return jsonify(_document_response(new_document, "File uploaded and processed successfully",
+                                                  processing_result=processing_result)), 201
                 
             except Exception as processing_error:
                 print(f"Error processing document {filename}: {processing_error}")
-                return jsonify({
-                    "msg": "File uploaded successfully but processing failed",
-                    "id": new_document.id,
-                    "filename": new_document.filename,
-                    "filepath": new_document.filepath,
-                    "upload_date": new_document.upload_date.isoformat(),
-                    "file_size_bytes": new_document.file_size_bytes,
-                    "processing_error": str(processing_error),
-                    "warning": "Document was saved but could not be processed for search functionality"
-                }), 201
+                # Forget the hash so uploading the same file again retries processing
+                new_document.content_hash = None
+                db.session.commit()
+                return jsonify(_document_response(
+                    new_document,
+                    "File uploaded successfully but processing failed",
+                    processing_error=str(processing_error),
+                    warning="Document was saved but could not be processed for search functionality"
+                )), 201
 
         except Exception as e:
             db.session.rollback()
-            if os.path.exists(filepath):
+            if os.path.exists(upload_path):
+                os.remove(upload_path)
+            if not existing_document and os.path.exists(filepath):
                 os.remove(filepath)
             print(f"Error uploading document: {e}")
             return jsonify({"error": "Could not upload document", "details": str(e)}), 500
@@ -138,13 +211,22 @@ def delete_document(document_id):
     if document.owner_id != user.id:
         return jsonify({"error": "You do not have permission to delete this document"}), 403
 
+    try:
+        # Drop indexed pages and page images first so a failure leaves the record to retry with.
+        # Pages other documents still link to are kept.
+        if not document.shares_index():
+            remove_document(document.index_document_id)
+    except Exception as e:
+        print(f"Error deleting document pages from the index: {e}")
+        return jsonify({"error": "Error deleting document from the search index", "details": str(e)}), 500
+
     try:
         if os.path.exists(document.filepath):
             os.remove(document.filepath)
 
         db.session.delete(document)
         db.session.commit()
-        return jsonify({"msg": f"Document '{document.filename}' and its record deleted successfully."}), 200
+        return jsonify({"msg": f"Document '{document.filename}', its indexed pages and its record deleted successfully."}), 200
 
     except OSError as e:
         db.session.rollback()
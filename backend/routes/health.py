@@ -0,0 +1,17 @@
+from flask import Blueprint, jsonify
+from core.rag_singleton import rag
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route("/healthz", methods=["GET"])
+def healthz():
+    # Liveness: the process is up and serving requests
+    return jsonify({"status": "ok"}), 200
+
+@health_bp.route("/readyz", methods=["GET"])
+def readyz():
+    # Readiness: the RAG pipeline is loaded and warmed up
+    status = rag.status()
+    if rag.is_ready():
+        return jsonify({"status": "ready", **status}), 200
+    return jsonify({"status": "not_ready", **status}), 503
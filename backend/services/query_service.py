@@ -8,19 +8,27 @@ to process user documents and answer queries.
 import tempfile
 import os
 from werkzeug.datastructures import FileStorage
-from typing import List
+from typing import List, Dict, Iterable
 from core.utils import PdfConverter
 from core.rag_singleton import rag  
-from agents.agents import agent
-from agents.tasks import build_task
-from crewai import Crew
+from config.settings import (PDF_DPI, PDF_EMBED_SIZE, POPPLER_PATH, PDF_PAGE_WINDOW, PDF_WORKERS,
+                             PDF_IMAGE_FORMAT, PDF_IMAGE_QUALITY, PDF_PNG_COMPRESS_LEVEL, PAGE_STORE_DIR)
 
 # Initialize PDF converter instance
-converter = PdfConverter()
+converter = PdfConverter(image_dir=PAGE_STORE_DIR, dpi=PDF_DPI, embed_size=PDF_EMBED_SIZE, poppler_path=POPPLER_PATH,
+                         page_window=PDF_PAGE_WINDOW, workers=PDF_WORKERS, image_format=PDF_IMAGE_FORMAT,
+                         image_quality=PDF_IMAGE_QUALITY, png_compress_level=PDF_PNG_COMPRESS_LEVEL)
 
-async def process_documents(files: List[FileStorage]):
-    all_data = []
-    for file_item in files:
+def _iter_pages(files: List[FileStorage], document_ids: List[int], owner_id=None):
+    """
+    Yield page records as they are rasterized so indexing starts with the first
+    page window and memory stays bounded by the window size, not the page count.
+    With several rasterization workers, all files are converted in parallel while
+    pages still arrive in file and page order.
+    Each page is tagged with its owner so searches can be scoped to one user.
+    """
+    file_paths, file_ids, temp_paths = [], [], []
+    for file_item, document_id in zip(files, document_ids):
         if isinstance(file_item, str):
             # If file_item is a file path (string), use it directly
             file_path = file_item
@@ -31,36 +39,107 @@ async def process_documents(files: List[FileStorage]):
         else:
             # If file_item is a FileStorage object, save it to temp location first
             temp_dir = tempfile.gettempdir()
-            temp_path = os.path.join(temp_dir, file_item.filename)
+            file_path = os.path.join(temp_dir, file_item.filename)
             
             # Save uploaded file to temporary location
-            file_item.save(temp_path)
-            file_path = temp_path
-        
-        try:
-            # Convert PDF to structured data using the file path
-            data = converter.convert(file_path)
-            all_data.extend(data)
-            
-            # Clean up temporary file if it was created
-            if isinstance(file_item, FileStorage) and os.path.exists(temp_path):
-                os.unlink(temp_path)
-                
-        except Exception as e:
-            print(f"Error processing file {file_path}: {e}")
-            # Clean up temporary file if it was created
-            if isinstance(file_item, FileStorage) and os.path.exists(temp_path):
+            file_item.save(file_path)
+            temp_paths.append(file_path)
+        file_paths.append(file_path)
+        file_ids.append(document_id)
+    
+    try:
+        for page in converter.iter_convert_many(file_paths, file_ids):
+            page["owner_id"] = owner_id
+            yield page
+    except Exception as e:
+        print(f"Error processing files {file_paths}: {e}")
+    finally:
+        # Clean up temporary files once all their pages have been rasterized
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
                 os.unlink(temp_path)
-            continue
+
+async def process_documents(files: List[FileStorage], document_ids: List[int] = None, owner_id=None):
+    """
+    Convert uploaded PDFs to page images and index them in the RAG system.
+    
+    Pages are streamed into the ingestion pipeline as they are converted.
+    
+    Args:
+        files (List[FileStorage]): Uploaded files or paths to saved PDFs
+        document_ids (List[int]): Database ids of the documents, one per file.
+            Stable ids let re-uploads re-index only new or changed pages.
+        owner_id: Id of the user who owns the documents, stored with every page
+    
+    Returns:
+        Dict: Processing status and the number of pages indexed
+    """
+    document_ids = document_ids or [None] * len(files)
     
     # Index all processed documents in RAG system
-    if all_data:
-        rag.index_document(all_data)
-        return {"status": f"Documents processed and indexed. Processed {len(all_data)} pages."}
+    page_count = rag.index_document(_iter_pages(files, document_ids, owner_id))
+    if page_count:
+        return {"status": f"Documents processed and indexed. Processed {page_count} pages.", "pages": page_count}
     else:
-        return {"status": "No documents were successfully processed."}
+        return {"status": "No documents were successfully processed.", "pages": 0}
+
+def remove_document(document_id: int) -> Dict[str, int]:
+    """
+    Delete a document's indexed pages and its stored page images.
+    
+    Args:
+        document_id (int): Database id of the document
+        
+    Returns:
+        Dict[str, int]: Number of page images removed
+    """
+    rag.delete_documents([document_id])
+    return {"page_images": converter.page_store.delete(document_id)}
+
+def collect_garbage(document_ids: Iterable[int], dry_run: bool = False) -> Dict[str, List[int]]:
+    """
+    Reconcile the vector index and the page store against the documents table.
+    
+    Indexed pages and page images whose document id is not in document_ids are removed.
+    
+    Args:
+        document_ids (Iterable[int]): Ids of all documents in the database
+        dry_run (bool): Only report what would be removed
+        
+    Returns:
+        Dict[str, List[int]]: Orphaned document ids found in the index and in the page store
+    """
+    valid = set(document_ids)
+    orphaned_points = sorted(rag.indexed_document_ids() - valid)
+    orphaned_images = sorted(set(converter.page_store.document_ids()) - valid)
+    if not dry_run:
+        if orphaned_points:
+            rag.delete_documents(orphaned_points)
+        for doc_id in orphaned_images:
+            converter.page_store.delete(doc_id)
+    return {"indexed": orphaned_points, "page_images": orphaned_images}
 
-async def process_query(query: str):
+def backfill_owners(owners: Dict[int, int], dry_run: bool = False) -> List[int]:
+    """
+    Set the owner on indexed pages stored before pages recorded it.
+    
+    Searches are always scoped to the caller, so such pages are not found until they have an owner.
+    
+    Args:
+        owners (Dict[int, int]): Owner id of each document id pages are indexed under
+        dry_run (bool): Only report what would be updated
+        
+    Returns:
+        List[int]: Ids of the documents whose pages were given an owner
+    """
+    unowned = sorted(doc_id for doc_id in rag.unowned_document_ids() if doc_id in owners)
+    if not dry_run:
+        for doc_id in unowned:
+            rag.set_document_owner(doc_id, owners[doc_id])
+    return unowned
+
+async def process_query(query: str, owner_id=None, document_ids: List[int] = None,
+                        top_k: int = None, score_threshold: float = None):
     """
     Process user query using CrewAI agents and RAG system.
     
@@ -69,11 +148,31 @@ async def process_query(query: str):
     
     Args:
         query (str): User's question or search query
+        owner_id: Only search documents owned by this user when given
+        document_ids (List[int]): Optionally restrict the search to these documents
+        top_k (int): Number of pages to retrieve, the configured default when None
+        score_threshold (float): Minimum retrieval score of a page, the configured default when None
         
     Returns:
         Dict[str, str]: Response containing the answer to the query
     """
-    task = build_task(query)
+    # Imported here so that loading the routes does not pull in CrewAI
+    from agents.agents import agent, build_agent
+    from agents.tasks import build_task
+    from crewai import Crew
+    
+    search_kwargs = {
+        key: value for key, value in {
+            "owner_id": owner_id,
+            "document_ids": document_ids,
+            "top_k": top_k,
+            "score_threshold": score_threshold,
+        }.items() if value is not None
+    }
+    # Scoped or tuned requests get an agent whose retrieval tool applies these options
+    if search_kwargs:
+        agent = build_agent(**search_kwargs)
+    task = build_task(query, agent, **search_kwargs)
     # Create crew with our multimodal agent
     crew = Crew(agents=[agent], tasks=[task])
     
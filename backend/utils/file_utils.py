@@ -1,3 +1,4 @@
+import hashlib
 from config.settings import Config
 
 def allowed_file(filename):
@@ -46,4 +47,29 @@ def validate_file_exists(filepath):
     if os.path.getsize(filepath) == 0:
         return False, "File is empty"
     
-    return True, ""
\ No newline at end of file
+    return True, ""
+
+def save_with_hash(file, filepath, chunk_size=1024 * 1024):
+    """
+    Stream an uploaded file to disk while computing its SHA-256, so the
+    content is read only once.
+    
+    Args:
+        file: Uploaded file object
+        filepath (str): Destination path
+        chunk_size (int): Bytes read per chunk
+        
+    Returns:
+        tuple: (int, str) - (size in bytes, hex digest)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(filepath, 'wb') as out:
+        while True:
+            chunk = file.stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
@@ -0,0 +1,4 @@
+from app import app, start_warmup
+
+# Entry point for WSGI/ASGI servers, e.g. `gunicorn wsgi:app`; warms the models once the server imports it
+start_warmup()